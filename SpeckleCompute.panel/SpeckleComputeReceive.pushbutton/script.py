@@ -1,23 +1,16 @@
 import clr
 from Autodesk.Revit import DB
 import zero11h.revit_api.revit_utils as mru
+import zero11h.revit_api.extensible_storage as mes
+from zero11h.speckle import session
+from zero11h.speckle.diff import diff_received_objects, key_received_objects
+from zero11h.speckle.receive import ReceivePipeline
+from zero11h.speckle.report import RunReport
+from zero11h.speckle.watch import BranchWatcher, get_watcher, set_watcher
+from zero11h.revit_api.ui import ExternalEventDispatcher
 import os
 
-# clr.AddReferenceToFileAndPath(r'C:\Users\David\AppData\Roaming\Autodesk\Revit\Addins\2024\SpeckleRevit2\SpeckleCore2') #SpeckleCore2
-# clr.AddReferenceToFileAndPath(r'C:\Users\David\AppData\Roaming\Speckle\Kits\Objects\Objects.Converter.Revit2024') #Revit Objects
-
-appdata = os.getenv('APPDATA')
-
-speckleCorePath = (r'\Autodesk\Revit\Addins\2024\SpeckleRevit2\SpeckleCore2') #SpeckleCore2
-speckleCoreFullPath = appdata + speckleCorePath
-
-objectsPath = (r'\Speckle\Kits\Objects\Objects.Converter.Revit2024')
-objectsPathFullPath = appdata + objectsPath
-
-clr.AddReferenceToFileAndPath(speckleCoreFullPath) #SpeckleCore2
-clr.AddReferenceToFileAndPath(objectsPathFullPath) #Revit Objects
-
-from Speckle.Core import Api, Transports, Credentials, Kits
+from Speckle.Core import Api
 import Objects
 
 
@@ -26,6 +19,14 @@ import Objects
 streamId = "319b7f5b40"
 branchName = "main"
 
+# pyRevit sets __shiftclick__ when the button is Shift+Clicked
+try:
+    watchMode = __shiftclick__
+except NameError:
+    watchMode = False
+# pyRevit must keep the engine alive for the watch mode ExternalEvent callbacks
+__persistentengine__ = True
+
 uiapp = __revit__
 uidoc = uiapp.ActiveUIDocument
 app = uiapp.Application
@@ -34,18 +35,6 @@ doc = uidoc.Document
 
 
 
-def get_account_with_token():
-     
-    server_info = Api.ServerInfo()
-    server_info.url = "http://139.59.153.219/"
-    account = Credentials.Account()
-    account.token = "121657036ca1f96cc67872e539d66a545346f08065"
-    account.serverInfo = server_info
-
-    return account
-
-
-
 def get_branch(streamId,branchName ):
     branch = client.BranchGet(streamId, branchName, 1)
     branch.Wait()
@@ -53,68 +42,131 @@ def get_branch(streamId,branchName ):
 
     return branch_result
 
-def receive(objectId, transport):
-    received_data = Api.Operations.Receive( objectId,  transport)
+def receive(objectId, transport, local_transport):
+    received_data = Api.Operations.Receive(objectId, transport, local_transport)
     received_data.Wait()
     revit_data = received_data.Result
     return revit_data
 
-# defaultAccount = Credentials.AccountManager.GetDefaultAccount()
-defaultAccount = get_account_with_token()
 
-client = Api.Client(defaultAccount)
+client = session.get_client()
 
 branch = get_branch(streamId, branchName)
 objectId = branch.commits.items[0].referencedObject
 
-transport = Transports.ServerTransport(defaultAccount, streamId)
 
-data = receive(objectId, transport)
+def tag_received_elements(key, dshape, elements):
+    for element in elements:
+        speckle_metadata = mes.SpeckleObjectMetadata(element)
+        speckle_metadata.speckle_id = dshape.id
+        speckle_metadata.speckle_application_id = key
+        speckle_metadata.speckle_stream_id = streamId
+        print "Created DirectShape Id {}".format(element.Id)
 
 
-print(data)
-xdata = data['@data']
-unwrapped_data = dict(data['@data'].GetMembers())
+def receive_and_convert(objectId):
+    runReport = RunReport('receive',
+                          stream_id=streamId,
+                          branch=branchName,
+                          object_id=objectId,
+                          versions=session.get_versions())
+    transport = session.get_server_transport(streamId)
+    local_transport = session.get_local_transport(streamId)
 
+    runReport.info['cached'] = bool(local_transport.GetObject(objectId))
+    if runReport.info['cached']:
+        print("Commit object {} found in local cache".format(objectId))
 
+    with runReport.stage('receive', count=1):
+        data = receive(objectId, transport, local_transport)
+    runReport.add_stage('download', seconds=transport.Elapsed.TotalSeconds)
 
-keys = []
 
-for k in unwrapped_data.keys():
-	keys.append(k)
+    print(data)
+    xdata = data['@data']
+    unwrapped_data = dict(data['@data'].GetMembers())
 
-direct_shapes = xdata[keys[0]]
 
 
-# convert Speckle Base to Revit Geometry 
-kit = Kits.KitManager.GetDefaultKit()
-converter = kit.LoadConverter(Objects.Converter.Revit.ConverterRevit.RevitAppName)
-converter.SetContextDocument(doc)
+    keys = []
 
-print(converter)
+    for k in unwrapped_data.keys():
+        keys.append(k)
 
-for dshape in direct_shapes:
-    print(dshape)
-    directShape = converter.ConvertToNative(dshape)
-     
-t = DB.Transaction(doc,'Create DirectShape')
-t.Start()
+    direct_shapes = xdata[keys[0]]
+    runReport.info['received_objects'] = len(direct_shapes)
 
-try:
 
-    # fallback = Objects.Converter.Revit.ConverterRevit.ToNativeMeshSettingEnum.Default
-    # directShape = converter.DirectShapeToNative(data, fallback)
-    for dshape in direct_shapes:
-        directShape = converter.ConvertToNative(dshape)
-        for guid in directShape.CreatedIds:
-            print "Created DirectShape Id {}".format(doc.GetElement(guid).Id)
+    # convert Speckle Base to Revit Geometry 
+    converter = session.get_converter(doc)
+
+    print(converter)
 
-    t.Commit()
-except Exception as ex:
-    print(ex)
-    # print(traceback.format_exc())
-    t.RollBack()
-finally:
-    t.Dispose()
+    # Only objects whose Speckle id is new or changed since the last receive are converted
+    with runReport.stage('diff', count=len(direct_shapes)):
+        received_objects = key_received_objects(direct_shapes)
+        received_elements = mes.get_speckle_received_elements(streamId)
+        existing_ids = dict((key, mes.SpeckleObjectMetadata(elements[0]).speckle_id)
+                            for key, elements in received_elements.items())
+        diff = diff_received_objects(dict((key, dshape.id) for key, dshape in received_objects.items()),
+                                     existing_ids)
+    print(diff)
+    runReport.add_section('diff', {'new': len(diff.new),
+                                   'changed': len(diff.changed),
+                                   'unchanged': len(diff.unchanged),
+                                   'removed': len(diff.removed)})
 
+    to_delete = [element.Id for key in diff.to_delete for element in received_elements[key]]
 
+    # fallback = Objects.Converter.Revit.ConverterRevit.ToNativeMeshSettingEnum.Default
+    # directShape = converter.DirectShapeToNative(data, fallback)
+    pipeline = ReceivePipeline(doc, converter, batch_size=100, on_converted=tag_received_elements)
+    try:
+        report = pipeline.run([(key, received_objects[key]) for key in diff.to_convert],
+                              to_delete=to_delete,
+                              name='Create DirectShape')
+    except Exception as ex:
+        print(ex)
+        # print(traceback.format_exc())
+        runReport.info['error'] = str(ex)
+    else:
+        print(report)
+        for record in report.slowest(5):
+            print("  {} {} {:.3f} s".format(record.key, record.speckle_type, record.seconds))
+        for record in report.failed:
+            print("  FAILED {} {}: {}".format(record.key, record.speckle_type, record.error))
+        runReport.add_stage('convert to native', seconds=report.total_seconds, count=len(report.records))
+        runReport.add_stage('transaction commit', seconds=report.transaction_seconds)
+        runReport.add_section('conversion', report.to_dict())
+    print(runReport)
+    print("Receive report: {}".format(runReport.dump(os.path.join(session.CACHE_PATH, 'reports'))))
+
+
+def get_branch_head():
+    return get_branch(streamId, branchName).commits.items[0].referencedObject
+
+
+def toggle_watch_mode(objectId):
+    """
+    Shift+Click starts watching the branch, next Shift+Click stops it.
+    Receives are triggered only when the branch head changes.
+    """
+    watcher = get_watcher(streamId, branchName)
+    if watcher and watcher.is_running:
+        watcher.stop()
+        print("Stopped watching {}/{}. {}".format(streamId, branchName, watcher))
+        return
+    dispatcher = ExternalEventDispatcher('SpeckleCompute Branch Watch')
+    watcher = BranchWatcher(get_branch_head,
+                            lambda head: dispatcher.post(receive_and_convert, head),
+                            last_head=objectId)
+    set_watcher(streamId, branchName, watcher)
+    watcher.start()
+    print("Watching {}/{} for new commits".format(streamId, branchName))
+
+
+if watchMode:
+    toggle_watch_mode(objectId)
+else:
+    receive_and_convert(objectId)
+    print(session.startup_report())
@@ -1,30 +1,26 @@
 import clr
 import System
 import System.Threading.Tasks
-from System.Collections.Generic import List 
+from System.Collections.Generic import List
 import os
 
 from Autodesk.Revit import DB
 from Autodesk.Revit.UI.Selection import ObjectType
+import Autodesk.Revit.Exceptions as RevitExceptions
 
 import json
-import threading
-
-import zero11h.revit_api.revit_utils as mru
-
-appdata = os.getenv('APPDATA')
-
-speckleCorePath = (r'\Autodesk\Revit\Addins\2024\SpeckleRevit2\SpeckleCore2') #SpeckleCore2
-speckleCoreFullPath = appdata + speckleCorePath
-
-objectsPath = (r'\Speckle\Kits\Objects\Objects.Converter.Revit2024')
-objectsPathFullPath = appdata + objectsPath
-
-
-clr.AddReferenceToFileAndPath(speckleCoreFullPath) #SpeckleCore2
-clr.AddReferenceToFileAndPath(objectsPathFullPath) #Revit Objects
-
-from Speckle.Core import Credentials, Api, Transports, Kits
+import sys
+import time
+
+from zero11h.speckle import session
+from zero11h.speckle.metadata import layer_group_metadata_to_base
+from zero11h.speckle.perforators import PerforatorOutlineCache
+from zero11h.speckle.report import RunReport
+from zero11h.speckle.send_queue import SendJob, SendJobStatus, get_send_queue
+from zero11h.speckle.transports import ByteCountingTransport
+
+from Speckle.Core import Api, Transports
+from Speckle.Core.Models import Base
 import Objects
 
 
@@ -32,83 +28,127 @@ import Objects
 streamId = "319b7f5b40"
 branchName = "main"
 
+# Upload and commit on a worker thread so Revit is not blocked while the send finishes
+sendInBackground = True
+# pyRevit must keep the engine alive for the send queue ExternalEvent callbacks
+__persistentengine__ = True
+
+_011H_SCHEMA_GUID = "d2076246-c30b-414b-b7be-071151d82a39"
+
 uiapp = __revit__
 uidoc = uiapp.ActiveUIDocument
 app = uiapp.Application
 doc = uidoc.Document
 
-#Pick a group
-sel = uiapp.ActiveUIDocument.Selection;
-pickedref = sel.PickObject(ObjectType.Element, "Please select a group");
-layerGroup = doc.GetElement(pickedref);
+# pyRevit sets __shiftclick__ when the button is Shift+Clicked
+try:
+    send_all_layer_groups = __shiftclick__
+except NameError:
+    send_all_layer_groups = False
 
-# convert Revit Geometry to Speckle Base
-kit = Kits.KitManager.GetDefaultKit()
-converter = kit.LoadConverter(Objects.Converter.Revit.ConverterRevit.RevitAppName)
-converter.SetContextDocument(doc)
+schema = DB.ExtensibleStorage.Schema.Lookup(System.Guid.Parse(_011H_SCHEMA_GUID))
+field = schema.GetField("JSONData")
 
-layerGroupBase = converter.ConvertToSpeckle(layerGroup)
 
-#send metadata along with base geometry
-guid = System.Guid.Parse("d2076246-c30b-414b-b7be-071151d82a39");
-schema = DB.ExtensibleStorage.Schema.Lookup(guid);
-field = schema.GetField("JSONData")
-meta = layerGroup.GetEntity(schema)
-metadata = meta.Get[System.String](field)
+def get_layer_group_metadata(element):
+    """Returns the JSONData string of a LayerGroup or None if element has no LayerGroup metadata"""
+    meta = element.GetEntity(schema)
+    if not meta.IsValid():
+        return None
+    metadata = meta.Get[System.String](field)
+    if not metadata or 'LayerGroupMetadata' not in metadata:
+        return None
+    return metadata
 
-# #include metadata
-layerGroupBase["metadata"] = metadata
 
+def get_tagged_layer_groups():
+    """All the LayerGroup DirectShapes in the model with 011h metadata"""
+    schema_filter = DB.ExtensibleStorage.ExtensibleStorageFilter(schema.GUID)
+    direct_shapes = DB.FilteredElementCollector(doc).OfClass(DB.DirectShape). \
+        WherePasses(schema_filter). \
+        WhereElementIsNotElementType()
+    return [ds for ds in direct_shapes if get_layer_group_metadata(ds)]
 
-json_metadata = json.loads(metadata)
 
-self_guid =  json_metadata["SelfGuid"]
-perforator_data =  json_metadata["LayerGroupMetadata"]["PerforatorData"]
+def pick_layer_groups():
+    """Current selection if any, else prompt the user to pick one or more groups"""
+    selected_ids = uidoc.Selection.GetElementIds()
+    if selected_ids.Count:
+        elements = [doc.GetElement(eid) for eid in selected_ids]
+    else:
+        try:
+            picked_refs = uidoc.Selection.PickObjects(ObjectType.Element, "Please select one or more groups")
+        except RevitExceptions.OperationCanceledException:
+            sys.exit(1)
+        elements = [doc.GetElement(ref) for ref in picked_refs]
+    return [element for element in elements if get_layer_group_metadata(element)]
 
-# Component guid (from layergroup metadata)
-comp = doc.GetElement(self_guid)
 
-all_curves = []
+def get_perforator_lines(json_metadata):
+    base_lines = []
+    perforator_data = json_metadata["LayerGroupMetadata"]["PerforatorData"]
 
-base_lines = []
+    #get openings and perforator curves
+    for k in perforator_data.Keys:
 
-#get openings and perforator curves
-for k in perforator_data.Keys:
+        for guid in perforator_data[k]:
+            perf = doc.GetElement(guid)
 
-    for guid in perforator_data[k]:
-        perf_guid = guid
-        perf = doc.GetElement(perf_guid)
+            # TODO - perforators come as elementId
 
-        # TODO - perforators come as elementId
+            with runReport.stage('extract', count=1):
+                outline = perforator_outlines.get_outline(perf)
+            with runReport.stage('convert perforator lines', count=len(outline)):
+                for curve in outline:
+                    base_line = converter.LineToSpeckle(curve, doc)
+                    base_lines.append(base_line)
 
-        solid = mru.RvtSolidUtils.get_all_solids_from_instance(perf, view_detail=DB.ViewDetailLevel.Coarse)[0]
-        face = mru.RvtSolidUtils.get_solid_face_from_normal(solid, perf.FacingOrientation.Negate())
+    return base_lines
 
-        res = []
 
-        for edge in face.EdgeLoops.Item[0]:
-            all_curves.append(edge.AsCurve())
+def layer_group_to_speckle(layerGroup):
+    """Convert Revit Geometry to Speckle Base and send metadata along with base geometry"""
+    with runReport.stage('convert', count=1):
+        layerGroupBase = converter.ConvertToSpeckle(layerGroup)
 
-            base_line = converter.LineToSpeckle(edge.AsCurve(), doc)
-            base_lines.append(base_line)
-    # all_curves.append(res)
+    json_metadata = json.loads(get_layer_group_metadata(layerGroup))
+    # #include metadata as structured objects so unchanged sections are de-duplicated by their hash
+    with runReport.stage('convert metadata', count=1):
+        layerGroupBase["metadata"] = layer_group_metadata_to_base(json_metadata)
+    layerGroupBase["PerforatorLines"] = get_perforator_lines(json_metadata)
 
-layerGroupBase["PerforatorLines"]=  base_lines
+    return layerGroupBase
 
 
-# Speckle Stuff .....................
+if send_all_layer_groups:
+    layerGroups = get_tagged_layer_groups()
+else:
+    layerGroups = pick_layer_groups()
+
+if not layerGroups:
+    print("No LayerGroups with 011h metadata selected. Nothing sent")
+    sys.exit(1)
+
+# convert Revit Geometry to Speckle Base
+converter = session.get_converter(doc)
+
+runReport = RunReport('send',
+                      stream_id=streamId,
+                      branch=branchName,
+                      layer_groups=len(layerGroups),
+                      versions=session.get_versions())
 
+perforator_outlines = PerforatorOutlineCache(view_detail=DB.ViewDetailLevel.Coarse)
 
+# All LayerGroups go detached under a single root so they are sent in one Operations.Send,
+# one commit, and shared children are only stored once in the server
+rootBase = Base()
+rootBase["@LayerGroups"] = [layer_group_to_speckle(layerGroup) for layerGroup in layerGroups]
+print(perforator_outlines)
 
-def get_account_with_token():
-     
-    server_info = Api.ServerInfo()
-    server_info.url = "http://139.59.153.219/"
-    account = Credentials.Account()
-    account.token = "121657036ca1f96cc67872e539d66a545346f08065"
-    account.serverInfo = server_info
 
-    return account
+# Speckle Stuff .....................
+
 
 
 def create_branch(streamId, branchName):
@@ -122,21 +162,35 @@ def create_branch(streamId, branchName):
 def create_hash(base, branch, streamId ):
 
     # hash_ = branch.commits.items[0].referencedObject
-    transport = Transports.ServerTransport(defaultAccount, streamId)
-    lst = List[Transports.ITransport]() 
+    transport = session.get_server_transport(streamId)
+    # Measures how many bytes are sent without keeping a copy of the serialized objects
+    byte_counter = ByteCountingTransport()
+    lst = List[Transports.ITransport]()
     lst.Add(transport)
+    lst.Add(byte_counter)
 
+    start = time.time()
     hashTask = Api.Operations.Send(base,lst);
     hashTask.Wait()
     newHash = hashTask.Result
+    # Serialization and upload run interleaved inside Operations.Send. Upload is the time the
+    # server transport spent writing, serialization the rest
+    upload_seconds = transport.Elapsed.TotalSeconds
+    runReport.add_stage('serialize',
+                        seconds=time.time() - start - upload_seconds,
+                        count=byte_counter.saved_objects)
+    runReport.add_stage('upload',
+                        seconds=upload_seconds,
+                        count=byte_counter.saved_objects,
+                        nbytes=byte_counter.saved_bytes)
     return newHash
 
 
-def commit(newHash, streamId, branchName):
+def commit(newHash, streamId, branchName, message="Commit created with Speckle Compute"):
 
     CommitCreateInput = Api.CommitCreateInput()
     CommitCreateInput.branchName = branchName
-    CommitCreateInput.message = "Commit created with Speckle Compute"
+    CommitCreateInput.message = message
     CommitCreateInput.objectId = newHash
     CommitCreateInput.streamId = streamId
     CommitCreateInput.sourceApplication = "SpeckleCompute"
@@ -146,16 +200,50 @@ def commit(newHash, streamId, branchName):
     return commitId
 
 
-# defaultAccount = Credentials.AccountManager.GetDefaultAccount()
-defaultAccount = get_account_with_token()
-client = Api.Client(defaultAccount)
+client = session.get_client()
+print(session.startup_report())
+
+commitMessage = "{} LayerGroups sent with Speckle Compute".format(len(layerGroups))
+
+
+def send_base(base):
+    branch = create_branch(streamId, branchName)
+    return create_hash(base, branch, streamId)
+
+
+def commit_base(newHash):
+    with runReport.stage('commit', count=1):
+        return commit(newHash, streamId, branchName, message=commitMessage)
+
+
+def dump_report():
+    print(runReport)
+    print("Send report: {}".format(runReport.dump(os.path.join(session.CACHE_PATH, 'reports'))))
+
+
+def report_progress(job):
+    print("{}: {}".format(job.name, job.status))
+
+
+def report_done(job):
+    if job.status == SendJobStatus.FAILED:
+        print("{} FAILED: {}".format(job.name, job.error))
+        runReport.info['error'] = job.error
+    else:
+        print ("Speckle Commit created: {} with {} LayerGroups".format(job.commit_id, len(layerGroups)))
+    dump_report()
 
-branch =  create_branch(streamId,branchName )
-newHash = create_hash(layerGroupBase, branch,streamId)
-commitId = commit(newHash, streamId, branchName)
-print ("Speckle Commit created: {}".format(commitId))
 
-# apparently no need for threading in PyRevit
-# thread= threading.Thread(target = send_to_speckle)
-# thread.start() 
-# thread.join() 
\ No newline at end of file
+if sendInBackground:
+    job = get_send_queue().submit(SendJob(rootBase,
+                                          send_base,
+                                          commit_base,
+                                          name=commitMessage,
+                                          on_progress=report_progress,
+                                          on_done=report_done))
+    print("{} queued. Revit can be used while it uploads".format(job.name))
+else:
+    newHash = send_base(rootBase)
+    commitId = commit_base(newHash)
+    print ("Speckle Commit created: {} with {} LayerGroups".format(commitId, len(layerGroups)))
+    dump_report()
@@ -3,7 +3,7 @@
 
 from .base_classes import (_BaseObject_,
                            _Base3DPanel_, _BaseWall_, PanelLocator, _WORKING_PHASE_,
-                           ConstructionSiteType, COMPONENTS_WORKSET)
+                           ConstructionSiteType, COMPONENTS_WORKSET, prefetch_model_rt_data)
 from .vertical_components import (Component, ComponentSlot, ComponentStructure, MEP_BOX_LOD350_FAMILY_NAME)
 from .openings import (FamilyInstancePointBased, MEPBoxInstance)
 from .horizontal_components import ComponentHorizontal, HorizontalPanel
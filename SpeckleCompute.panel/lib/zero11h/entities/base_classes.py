@@ -855,9 +855,38 @@ class ExecutionUnitInstance(_Base3DPanel_):
             self.rvt_solid.GraphicsStyleId).Name == mru.ExecutionUnitsSubcategories.VTS else False
 
 
+_RT_PREFETCHED_MODEL_TYPES = set()
+
+
+def prefetch_model_rt_data(all_data=False):
+    """
+    Prefetch RT data of every component type used in the model, once per model type and session.
+    Call it before building the model components so their construction never waits on RT.
+
+    Usage:
+        prefetch_model_rt_data(all_data=all_data)
+        components = [Component(rvt_element, all_data=all_data) for rvt_element in mru.get_model_components()]
+    """
+    model_type = 'full' if all_data else 'tree'
+    if model_type in _RT_PREFETCHED_MODEL_TYPES:
+        return
+    try:
+        # Types without EI_TypeID are skipped, their components fail on their own when built
+        type_ids = set([mru.PyParameterSet(mru.get_rvt_element_type(rvt_component)).get_value('EI_TypeID')
+                        for rvt_component in mru.get_model_components()])
+        prefetched = rt.prefetch_component_types(type_ids, model_type=model_type)
+        log.info('RT prefetch {}: {}. {}'.format(model_type, prefetched, rt.METRICS))
+    except Exception as ex:
+        # Not fatal. Components will ask RT for their own data and the next call tries again
+        log.warning('RT prefetch ERROR: {}'.format(ex))
+        return
+    _RT_PREFETCHED_MODEL_TYPES.add(model_type)
+
+
 class BaseComponent(_BaseObject_):
     """
     Base class for components. Only use it for inheritance. Do not instance it.
+    Call prefetch_model_rt_data before building the model components.
     """
     entity = 'BaseComponent'
 
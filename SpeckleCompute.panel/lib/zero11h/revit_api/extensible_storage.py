@@ -611,4 +611,58 @@ class PerforatorMetadata(ElementMetadata):
     
     @joint_guid.setter
     def joint_guid(self, value):
-        self._update_metadata_property("JointGUID", value)
\ No newline at end of file
+        self._update_metadata_property("JointGUID", value)
+
+
+class SpeckleObjectMetadata(ElementMetadata):
+    """
+    Metadata of elements created from a Speckle receive.
+
+    Stores the Speckle id of the object the element was converted from so next receives
+    can skip objects that did not change.
+    """
+    def __init__(self, rvt_element):
+        super(SpeckleObjectMetadata, self).__init__(rvt_element)
+
+    @property
+    def speckle_id(self):
+        """Speckle object id (content hash) of the received object"""
+        return self.metadata.get("SpeckleId")
+
+    @speckle_id.setter
+    def speckle_id(self, value):
+        self._update_metadata_property("SpeckleId", value)
+
+    @property
+    def speckle_application_id(self):
+        """Speckle applicationId. Stable across commits, unlike the object id"""
+        return self.metadata.get("SpeckleApplicationId")
+
+    @speckle_application_id.setter
+    def speckle_application_id(self, value):
+        self._update_metadata_property("SpeckleApplicationId", value)
+
+    @property
+    def speckle_stream_id(self):
+        return self.metadata.get("SpeckleStreamId")
+
+    @speckle_stream_id.setter
+    def speckle_stream_id(self, value):
+        self._update_metadata_property("SpeckleStreamId", value)
+
+
+def get_speckle_received_elements(stream_id):
+    """
+    Elements created from a receive of stream stream_id grouped by the key they were received with (see
+    zero11h.speckle.diff.key_received_objects)
+
+    Returns:
+        Dict[str, List[DB.Element]]
+    """
+    received = {}
+    for element in get_elements_with_schema_guid():
+        metadata = json.loads(element.GetEntity(_011h_SCHEMA).Get[System.String](_011H_SCHEMA_JSON_METADATA_FIELD))
+        if not metadata.get('SpeckleId') or metadata.get('SpeckleStreamId') != stream_id:
+            continue
+        received.setdefault(metadata.get('SpeckleApplicationId'), []).append(element)
+    return received
@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import threading
+import traceback
 
 import zero11h.revit_api.revit_utils as mru
 from zero11h.revit_api import (System, UI, DB, RevitExceptions,
@@ -41,6 +43,52 @@ class CustomISelectionFilter(UI.Selection.ISelectionFilter):
         return true
 
 
+class _DispatcherExternalEventHandler(UI.IExternalEventHandler):
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+
+    def Execute(self, uiapp):
+        self.dispatcher.dispatch()
+
+    def GetName(self):
+        return self.dispatcher.name
+
+
+class ExternalEventDispatcher(object):
+    """
+    Runs callables posted from any thread in Revit API context through an ExternalEvent
+
+    Must be created in Revit API context (ie: from a pushbutton script) because of ExternalEvent.Create
+
+    Usage:
+        dispatcher = ExternalEventDispatcher('My worker')
+        # from a worker thread
+        dispatcher.post(callback, arg1, arg2)
+    """
+    def __init__(self, name='zero11h ExternalEvent'):
+        self.name = name
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._external_event = UI.ExternalEvent.Create(_DispatcherExternalEventHandler(self))
+
+    def post(self, callback, *args):
+        if not callback:
+            return
+        with self._lock:
+            self._callbacks.append((callback, args))
+        self._external_event.Raise()
+
+    def dispatch(self):
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback, args in callbacks:
+            # One failing callback must not drop the ones after it nor raise into Revit
+            try:
+                callback(*args)
+            except Exception:
+                print('{} ERROR:\n{}'.format(self.name, traceback.format_exc()))
+
+
 class RvtSelection:
 
     @staticmethod
@@ -1,3 +1,6 @@
 from .rt_handler import rt_request, rt_constr_request
 from .rt_entities import LayerGroupType, LayerType, LayerMaterial
 from .rt_entities import PartialSegment, PartialSegmentLayer, ExecutionUnitType, ComponentType, TemplateType, ProcessType
+from .prefetch import prefetch_component_types
+from .snapshot import export_snapshot, load_snapshot, SnapshotRequestHandler
+from .metrics import METRICS
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+011h API client metrics. Pure python
+
+Api011hRequestHandler records every request, cache lookup and rate limiter wait by endpoint and
+api011h_request the time spent in each of its calls, so slow runs can be traced to RT or ruled out.
+
+Usage:
+    from zero11h.rt.metrics import METRICS
+    METRICS.reset()
+    ...  # Build components
+    print(METRICS)
+    METRICS.dump(folder)
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the request latency histogram buckets. Slower requests go in the last
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint_name(req_url, base_url=''):
+    """
+    Entity of req_url, its path without query or record id. segment/material/101 is segment/material
+    """
+    path = req_url[len(base_url):] if base_url and req_url.startswith(base_url) else req_url
+    path = path.split('?')[0].strip('/')
+    parts = path.split('/')
+    if len(parts) > 1 and parts[-1].isdigit():
+        parts = parts[:-1]
+    return '/'.join(parts)
+
+
+class EndpointMetrics(object):
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.coalesced = 0  # Requests answered by an identical request already in flight
+        self.seconds = 0.0
+        self.bytes = 0  # Response text length after decompression
+        self.wait_seconds = 0.0  # Spent in the rate limiter before sending
+        self.hits = 0
+        self.misses = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def add_latency(self, seconds):
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.histogram[position] += 1
+                return
+        self.histogram[-1] += 1
+
+    def to_dict(self):
+        return {'requests': self.requests,
+                'errors': self.errors,
+                'throttled': self.throttled,
+                'coalesced': self.coalesced,
+                'seconds': self.seconds,
+                'bytes': self.bytes,
+                'wait_seconds': self.wait_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hit_ratio,
+                'latency_histogram': dict(zip(['<={}'.format(bound) for bound in LATENCY_BUCKETS] +
+                                              ['>{}'.format(LATENCY_BUCKETS[-1])],
+                                              self.histogram))}
+
+
+class RTMetrics(object):
+    """Per endpoint request and cache metrics plus per call timings. Thread safe"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.endpoints = {}
+            self.calls = {}  # api011h_request method: {'count': int, 'seconds': float}
+
+    def _endpoint(self, name):
+        endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            endpoint = self.endpoints[name] = EndpointMetrics(name)
+        return endpoint
+
+    def get(self, name):
+        return self.endpoints.get(name)
+
+    def record_request(self, name, seconds, nbytes=0, error=False):
+        with self._lock:
+            endpoint = self._endpoint(name)
+            endpoint.requests += 1
+            endpoint.seconds += seconds
+            endpoint.bytes += nbytes
+            endpoint.add_latency(seconds)
+            if error:
+                endpoint.errors += 1
+
+    def record_throttled(self, name):
+        with self._lock:
+            self._endpoint(name).throttled += 1
+
+    def record_coalesced(self, name):
+        with self._lock:
+            self._endpoint(name).coalesced += 1
+
+    def record_wait(self, name, seconds):
+        with self._lock:
+            self._endpoint(name).wait_seconds += seconds
+
+    def record_cache(self, name, hits=0, misses=0):
+        with self._lock:
+            endpoint = self._endpoint(name)
+            endpoint.hits += hits
+            endpoint.misses += misses
+
+    @contextmanager
+    def call(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            seconds = time.time() - start
+            with self._lock:
+                call = self.calls.setdefault(name, {'count': 0, 'seconds': 0.0})
+                call['count'] += 1
+                call['seconds'] += seconds
+
+    def totals(self):
+        endpoints = list(self.endpoints.values())
+        hits = sum([endpoint.hits for endpoint in endpoints])
+        lookups = hits + sum([endpoint.misses for endpoint in endpoints])
+        return {'requests': sum([endpoint.requests for endpoint in endpoints]),
+                'errors': sum([endpoint.errors for endpoint in endpoints]),
+                'throttled': sum([endpoint.throttled for endpoint in endpoints]),
+                'coalesced': sum([endpoint.coalesced for endpoint in endpoints]),
+                'seconds': sum([endpoint.seconds for endpoint in endpoints]),
+                'bytes': sum([endpoint.bytes for endpoint in endpoints]),
+                'wait_seconds': sum([endpoint.wait_seconds for endpoint in endpoints]),
+                'hit_ratio': float(hits) / lookups if lookups else 0.0}
+
+    def to_dict(self):
+        with self._lock:
+            return {'started': self.started,
+                    'totals': self.totals(),
+                    'calls': dict([(name, dict(call)) for name, call in self.calls.items()]),
+                    'endpoints': dict([(name, endpoint.to_dict())
+                                       for name, endpoint in self.endpoints.items()])}
+
+    def dump(self, folder, name='rt_metrics'):
+        """Writes the metrics as {name}_{YYYYmmdd_HHMMSS}.json in folder and returns its path"""
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        filename = '{}_{}.json'.format(name, time.strftime('%Y%m%d_%H%M%S', time.localtime(self.started)))
+        filepath = os.path.join(folder, filename)
+        with open(filepath, 'w') as jsf:
+            json.dump(self.to_dict(), jsf, indent=2, sort_keys=True)
+        return filepath
+
+    def __repr__(self):
+        totals = self.totals()
+        return "RTMetrics {} requests in {:.2f} s, {} bytes, {:.0%} cache hits, waited {:.2f} s".format(
+            totals['requests'], totals['seconds'], totals['bytes'], totals['hit_ratio'], totals['wait_seconds'])
+
+
+# Shared by every handler, like the rate limiter
+METRICS = RTMetrics()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local mock of the 011h API for tests and load tests. Pure python
+
+Replays the records of an RTSnapshot (see snapshot.py), the RT data recorded by export_snapshot,
+answering the same URLs Api011hRequestHandler asks for:
+    {entity}?code=in:a,b,...            records by code
+    {entity}/{id}                        a single record, not wrapped in data
+    {entity}?eu_type={id}                template of an execution unit type
+    {entity}?updated_at=gt:{time}        records with a greater updated_at
+    {entity}                             the whole entity list
+Component type entities are looked up with their model_type, as the snapshot stores them.
+
+Every response waits latency seconds first, so caching, batching and concurrency changes can be
+benchmarked against realistic round trips:
+    python -m rt.mock_server rt_snapshot.json.gz --latency 0.08 --port 8011
+
+Usage in tests:
+    server = MockRTServer(snapshot, latency=0.05).start()
+    handler = Api011hRequestHandler(api_key='test')
+    handler.url = server.url
+    ...
+    server.stop()
+"""
+
+import gzip
+import io
+import json
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # Python 3
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qsl, unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qsl
+    from urllib import unquote
+
+from .snapshot import RTSnapshot, load_snapshot
+
+# Query parameters that only change the shape of the RT answer, not which records it has
+FORMAT_PARAMETERS = ('verbosity', 'model_type')
+
+
+def gzip_bytes(content):
+    buf = io.BytesIO()
+    gzip_file = gzip.GzipFile(fileobj=buf, mode='wb')
+    try:
+        gzip_file.write(content)
+    finally:
+        gzip_file.close()
+    return buf.getvalue()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _MockRTRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Lets clients keep connections alive
+
+    def do_GET(self):
+        mock = self.server.mock
+        mock.record_request(self.path)
+        if mock.latency:
+            time.sleep(mock.latency)
+        status, data = mock.answer(self.path)
+        content = json.dumps(data).encode('utf-8')
+        gzipped = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if gzipped:
+            content = gzip_bytes(content)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        if status in (429, 503):
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass  # Keep test and benchmark output clean
+
+
+class MockRTServer(object):
+    """
+    Threaded HTTP server replaying snapshot records.
+
+    Args:
+        snapshot: RTSnapshot or path to a snapshot bundle
+        latency: seconds every response is delayed
+        throttle: number of first requests answered with 429, to exercise retries
+    """
+    def __init__(self, snapshot, latency=0.0, host='127.0.0.1', port=0, throttle=0):
+        if not isinstance(snapshot, RTSnapshot):
+            snapshot = load_snapshot(snapshot)
+        self.snapshot = snapshot
+        self.latency = latency
+        self.throttle = throttle
+        self._lock = threading.Lock()
+        self.requests = []
+        self._server = _ThreadingHTTPServer((host, port), _MockRTRequestHandler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def record_request(self, path):
+        with self._lock:
+            self.requests.append(path)
+
+    @property
+    def request_count(self):
+        return len(self.requests)
+
+    def _find_entity(self, path, query):
+        """Snapshot entity of path and the record key in it, if the path ends with one"""
+        entity = unquote(path).strip('/')
+        candidates = [(entity, None)]
+        if '/' in entity:
+            candidates.append(tuple(entity.rsplit('/', 1)))
+        for candidate, key in candidates:
+            if query.get('model_type'):
+                candidate = '{}?model_type={}'.format(candidate, query.get('model_type'))
+            if candidate in self.snapshot.entities:
+                return candidate, key
+        return None, None
+
+    def answer(self, path):
+        """
+        Returns:
+            tuple: HTTP status and JSON data
+        """
+        with self._lock:
+            if self.throttle:
+                self.throttle -= 1
+                return 429, {'data': None, 'error': 'Too Many Requests'}
+        parsed = urlparse(path)
+        query = dict(parse_qsl(parsed.query))
+        entity, key = self._find_entity(parsed.path, query)
+        if entity is None:
+            return 404, {'data': None, 'error': 'Unknown entity {}'.format(parsed.path)}
+        if key is not None:
+            record = self.snapshot.get(entity, key)
+            if record is None:
+                return 404, {'data': None, 'error': 'Unknown id {}'.format(key)}
+            return 200, record
+        filters = [(name, value) for name, value in sorted(query.items()) if name not in FORMAT_PARAMETERS]
+        if not filters:
+            return 200, {'data': self.snapshot.records(entity), 'error': None}
+        name, value = filters[0]
+        if value.startswith('gt:'):
+            records = [record for record in self.snapshot.records(entity)
+                       if (record.get(name) or '') > value[3:]]
+            return 200, {'data': records, 'error': None}
+        keys = value[3:].split(',') if value.startswith('in:') else [value]
+        records = [self.snapshot.get(entity, key) for key in keys]
+        return 200, {'data': [record for record in records if record is not None], 'error': None}
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """Serve from a daemon thread"""
+        # Short poll interval so stop() returns quickly between tests
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __repr__(self):
+        return "MockRTServer at {} latency {:.3f} s, {} requests".format(self.url,
+                                                                         self.latency,
+                                                                         self.request_count)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Replay an RT snapshot as a local 011h API')
+    parser.add_argument('snapshot', help='snapshot bundle made with rt.snapshot.export_snapshot')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--port', type=int, default=8011)
+    arguments = parser.parse_args()
+    server = MockRTServer(arguments.snapshot, latency=arguments.latency, port=arguments.port)
+    print('Serving {}'.format(server))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
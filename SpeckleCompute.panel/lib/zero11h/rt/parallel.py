@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bounded parallel map and in-flight call coalescing for 011h API requests. Pure python
+
+IronPython 2.7 has no concurrent.futures. RT requests spend most of their time waiting for the
+network, so a few threads are enough to overlap round trips. The shared RateLimiter still decides
+when each request may go out.
+"""
+
+import sys
+import threading
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def map_bounded(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    [func(item) for item in items] running at most max_workers calls at the same time.
+
+    Results keep the order of items whatever order the calls finish in. If any call raises, the
+    remaining items are not started and the first error is raised again once running calls end.
+
+    Returns:
+        list
+    """
+    items = list(items)
+    if max_workers is None or max_workers < 2 or len(items) < 2:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)
+    errors = []
+    lock = threading.Lock()
+    pending = iter(enumerate(items))
+
+    def worker():
+        while True:
+            with lock:
+                if errors:
+                    return
+                try:
+                    index, item = next(pending)
+                except StopIteration:
+                    return
+            try:
+                results[index] = func(item)
+            except Exception:
+                with lock:
+                    errors.append(sys.exc_info())
+                return
+
+    threads = [threading.Thread(target=worker) for _ in range(min(max_workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0][1]
+    return results
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the function, the ones
+    arriving while it runs wait for it and share its result or error. Finished calls are not
+    remembered, caching is up to the caller.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.shared = 0
+
+    def do(self, key, func):
+        """
+        Returns:
+            tuple: func() result and whether it was shared from another caller's call
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = func()
+        except Exception as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def __len__(self):
+        return len(self._flights)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Prefetch of RT data for a whole model
+
+Components ask RT for their own component type while they are built. Prefetching every component
+type used by the model, and the materials and templates they reference, before building any
+component leaves all that data in the handler caches so component construction never waits on
+the network.
+"""
+
+import threading
+import traceback
+
+from .parallel import map_bounded
+from .rt_handler import rt_request
+
+
+def get_execution_unit_type_ids(component_type_data):
+    return [eu_data.get('execution_unit_type', {}).get('code')
+            for eu_data in component_type_data.get('associated_execution_unit_types') or []]
+
+
+def get_material_ids(component_type_data):
+    material_ids = []
+    for eu_data in component_type_data.get('associated_execution_unit_types') or []:
+        eu_type_data = eu_data.get('execution_unit_type') or {}
+        for lg_data in eu_type_data.get('associated_layer_group_types') or []:
+            lg_type_data = lg_data.get('layer_group_type') or {}
+            for lt_data in lg_type_data.get('associated_layer_types') or []:
+                material_ids.append((lt_data.get('layer_type') or {}).get('material_id'))
+    return material_ids
+
+
+def _run_in_threads(*callables):
+    """Runs callables in parallel and waits for all of them. Errors are printed, not raised"""
+    def run(func):
+        try:
+            func()
+        except Exception:
+            print('RT prefetch ERROR:\n{}'.format(traceback.format_exc()))
+
+    threads = [threading.Thread(target=run, args=(func,)) for func in callables]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def prefetch_component_types(type_ids, model_type='tree', request=None):
+    """
+    Delta sync the cached RT data, then fetch in bulk the component types type_ids and, in
+    parallel, the materials and execution unit templates they reference.
+
+    Returns:
+        dict: count of distinct component types, materials and templates prefetched
+    """
+    request = request or rt_request
+    type_ids = sorted(set([type_id for type_id in type_ids if type_id]))
+    if not type_ids:
+        return {'component_types': 0, 'materials': 0, 'templates': 0}
+    # Records that expired but did not change in RT are revalidated without being fetched again
+    request.sync()
+    component_types = request.get_component_types(ids=type_ids, model_type=model_type)
+
+    material_ids = set()
+    eu_type_ids = set()
+    for component_type_data in component_types:
+        material_ids.update(get_material_ids(component_type_data))
+        eu_type_ids.update(get_execution_unit_type_ids(component_type_data))
+    material_ids = sorted([material_id for material_id in material_ids if material_id])
+    eu_type_ids = sorted([eu_type_id for eu_type_id in eu_type_ids if eu_type_id])
+
+    def fetch_materials():
+        if material_ids:
+            request.get_materials(ids=material_ids)
+
+    def fetch_template(eu_type_id):
+        return request.get_template_from_execution_unit_id(eu_type_id=eu_type_id)
+
+    def fetch_templates():
+        map_bounded(fetch_template, eu_type_ids, max_workers=request.handler.max_workers)
+
+    _run_in_threads(fetch_materials, fetch_templates)
+    return {'component_types': len(component_types),
+            'materials': len(material_ids),
+            'templates': len(eu_type_ids)}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Adaptive token bucket rate limiter for the 011h API. Pure python
+"""
+
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by every Api011hRequestHandler
+
+    Up to burst requests go out without waiting when the API has been idle. After that requests
+    are spaced at rate requests per second. A 429/503 response halves the rate (down to min_rate)
+    and blocks every request until its Retry-After. Each successful request raises the rate again
+    by recovery until it is back to max_rate.
+    """
+    def __init__(self, rate=4.0, burst=8, min_rate=0.25, recovery=1.1,
+                 clock=time.time, sleep=time.sleep):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last = clock()
+        self._blocked_until = 0.0
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+        self.throttled = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """
+        Blocks until a request is allowed.
+
+        Returns:
+            float: seconds waited
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            wait = max(0.0, self._blocked_until - now)
+            if self._tokens < 1.0:
+                wait = max(wait, (1.0 - self._tokens) / self.rate)
+            self._tokens -= 1.0  # The token is reserved even if we have to wait for it
+            self.last_wait = wait
+            self.total_wait += wait
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    def success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * self.recovery)
+
+    def throttle(self, retry_after=None):
+        """
+        Called when the API answers 429 Too Many Requests or 503 Service Unavailable
+
+        Args:
+            retry_after: seconds from the Retry-After header, if any
+        """
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2.0)
+            self._tokens = 0.0
+            delay = retry_after if retry_after is not None else 1.0 / self.rate
+            self._blocked_until = max(self._blocked_until, self._clock() + delay)
+
+    def stats(self):
+        return {'rate': self.rate,
+                'max_rate': self.max_rate,
+                'last_wait': self.last_wait,
+                'total_wait': self.total_wait,
+                'throttled': self.throttled}
+
+    def __repr__(self):
+        return "RateLimiter {:.2f} req/s, waited {:.2f} s, throttled {} times".format(self.rate,
+                                                                                     self.total_wait,
+                                                                                     self.throttled)
+
+
+def parse_retry_after(value):
+    """Retry-After header as seconds. HTTP-date values are not used by RT and return None"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Persistent caches for 011h API records. Pure python
+
+pyRevit reloads the engine on most button presses and module level dicts are lost with it.
+These caches keep RT records on disk between sessions.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from System.IO import File  # IronPython
+except ImportError:
+    File = None
+
+try:
+    STRING_TYPES = (basestring,)  # IronPython 2.7
+except NameError:
+    STRING_TYPES = (str,)
+
+DEFAULT_TTL = 24 * 3600  # RT catalogue data almost never changes within a day
+
+# Folder of the RT cache files. The temp folder unless set, ie: tests keep theirs apart
+CACHE_FOLDER_ENV = 'SPECKLE_COMPUTE_RT_CACHE'
+
+
+def get_cache_folder():
+    """Read on every use, so the folder can be set after the caches are built"""
+    return os.environ.get(CACHE_FOLDER_ENV) or tempfile.gettempdir()
+
+
+def replace_file(src_filepath, dst_filepath):
+    """
+    Move src over dst in one step, so readers find either the old or the new dst, never none.
+    os.replace does not exist in IronPython 2.7, .NET File.Replace does the same on Windows
+    """
+    if File is not None:
+        if File.Exists(dst_filepath):
+            File.Replace(src_filepath, dst_filepath, None)
+        else:
+            File.Move(src_filepath, dst_filepath)
+        return
+    # CPython 2 has no os.replace, its os.rename replaces dst atomically on POSIX
+    getattr(os, 'replace', os.rename)(src_filepath, dst_filepath)
+
+
+class LRUCache(object):
+    """Least recently used cache with hit and miss counters"""
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            value = self._data.pop(key)
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+    def __repr__(self):
+        return "LRUCache {} items, hits:{} misses:{}".format(len(self._data), self.hits, self.misses)
+
+
+# Parsed JSON cache files keyed by (file path, modification time)
+PARSED_FILES = LRUCache(maxsize=32)
+
+
+def load_json_file(filepath):
+    """
+    JSON content of filepath, parsed only once per file modification.
+    The parsed structure is shared between callers, do not modify it.
+
+    Raises:
+        IOError, OSError: if filepath does not exist
+    """
+    key = (filepath, os.path.getmtime(filepath))
+    data = PARSED_FILES.get(key)
+    if data is None:
+        with open(filepath, 'r') as jsf:
+            data = json.load(jsf)
+        PARSED_FILES.set(key, data)
+    return data
+
+
+def remember_json_file(filepath, data):
+    """Register data just written to filepath so it is not parsed back"""
+    try:
+        PARSED_FILES.set((filepath, os.path.getmtime(filepath)), data)
+    except (IOError, OSError):  # Replaced again meanwhile. Parsed on next read
+        pass
+
+
+def cache_key(key):
+    """JSON object keys are always strings, so numeric ids are stored as strings too"""
+    if isinstance(key, (int, float)):
+        return str(key)
+    return key
+
+
+def as_id_list(ids):
+    """ids may be a single id or a list of them"""
+    if isinstance(ids, STRING_TYPES + (int, float)):
+        return [ids]
+    return ids
+
+
+class RecordIndex(object):
+    """
+    Positions of an RT entity list by key_field, so a subset of records is picked without
+    scanning the whole list. Records come back in list order, as a filter over the list would
+    """
+    def __init__(self, records, key_field='code'):
+        self.records = records
+        self.key_field = key_field
+        self.positions = {}
+        for position, record in enumerate(records):
+            self.positions.setdefault(cache_key(record.get(key_field)), []).append(position)
+
+    def select(self, ids):
+        positions = set()
+        for cid in as_id_list(ids):
+            positions.update(self.positions.get(cache_key(cid), ()))
+        return [self.records[position] for position in sorted(positions)]
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def merge_records(records, changed_records, key_field='code'):
+    """
+    New list with changed_records replacing the records with the same key_field in place and the
+    ones with new keys appended. records is not modified
+    """
+    merged = list(records)
+    positions = dict([(cache_key(record.get(key_field)), position) for position, record in enumerate(merged)])
+    for record in changed_records or []:
+        key = cache_key(record.get(key_field))
+        if key in positions:
+            merged[positions[key]] = record
+        else:
+            positions[key] = len(merged)
+            merged.append(record)
+    return merged
+
+
+# RecordIndex of the entity lists handlers return, keyed by (id(records), key_field)
+RECORD_INDEXES = LRUCache(maxsize=32)
+
+
+def get_record_index(records, key_field='code'):
+    """
+    RecordIndex of records, built once for every list object.
+    Lists from load_json_file are shared until their file changes, so this indexes each cache file
+    once per modification
+    """
+    key = (id(records), key_field)
+    index = RECORD_INDEXES.get(key)
+    if index is None or index.records is not records:  # id reused by a newer list
+        index = RecordIndex(records, key_field)
+        RECORD_INDEXES.set(key, index)
+    return index
+
+
+class PersistentEntityCache(object):
+    """
+    Dict like cache of RT records of one entity indexed by code or id, persisted as JSON in folder
+    or, if not given, in the RT cache folder (get_cache_folder).
+
+    Records older than ttl seconds are treated as missing, so callers fetch them again and
+    revalidate them with set. Changes are written to disk on save(). Safe to share between the
+    threads of a concurrent fetch.
+
+    Usage:
+        cache = PersistentEntityCache('component-type_tree')
+        if code not in cache:
+            cache[code] = fetched_record
+            cache.save()
+    """
+    def __init__(self, name, ttl=DEFAULT_TTL, folder=None):
+        self.name = name
+        self.ttl = ttl
+        self._folder = folder
+        self._entries = None  # key: {'timestamp': float, 'fetched': float, 'data': record}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def folder(self):
+        return self._folder or get_cache_folder()
+
+    @property
+    def cache_filepath(self):
+        return os.path.join(self.folder, 'temp_RT_index_{}.json'.format(self.name))
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._load()
+        return self._entries
+
+    def _load(self):
+        try:
+            with open(self.cache_filepath, 'r') as jsf:
+                return json.load(jsf)
+        except (IOError, OSError):  # Not written yet
+            return {}
+        except ValueError:  # Corrupted or half written file. Start again
+            return {}
+
+    def is_fresh(self, key):
+        entry = self.entries.get(cache_key(key))
+        if entry is None:
+            return False
+        return time.time() - entry.get('timestamp', 0) < self.ttl
+
+    def __contains__(self, key):
+        return self.is_fresh(key)
+
+    def __getitem__(self, key):
+        if not self.is_fresh(key):
+            raise KeyError(key)
+        return self.entries[cache_key(key)]['data']
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            now = time.time()
+            self.entries[cache_key(key)] = {'timestamp': now, 'fetched': now, 'data': value}
+            self._dirty = True
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        if not self.is_fresh(key):
+            return default
+        return self.entries[cache_key(key)]['data']
+
+    def oldest_timestamp(self):
+        """When the least recently fetched or revalidated record was, expired ones included"""
+        with self._lock:
+            timestamps = [entry.get('timestamp', 0) for entry in self.entries.values()]
+        return min(timestamps) if timestamps else None
+
+    def merge_changes(self, records, key_field='code', timestamp=None, max_age=None):
+        """
+        Replace the cached records that changed and mark every record fresh again, expired ones
+        included. records must be every change since oldest_timestamp(). Records not cached yet are
+        left out, they are fetched when asked for.
+
+        A change list cannot tell deleted records, so records last fetched in full more than max_age
+        seconds ago are dropped instead of revalidated. They are fetched again when asked for.
+
+        Returns:
+            int: number of cached records replaced
+        """
+        timestamp = timestamp or time.time()
+        replaced = 0
+        with self._lock:
+            entries = self.entries
+            for record in records or []:
+                key = cache_key(record.get(key_field))
+                if key in entries:
+                    entries[key]['data'] = record
+                    entries[key]['fetched'] = timestamp
+                    replaced += 1
+            if max_age is not None:
+                for key, entry in list(entries.items()):
+                    if timestamp - entry.get('fetched', entry.get('timestamp', 0)) > max_age:
+                        del entries[key]
+            for entry in entries.values():
+                entry['timestamp'] = timestamp
+            self._dirty = True
+        return replaced
+
+    def keys(self):
+        with self._lock:
+            keys = list(self.entries.keys())
+        return [key for key in keys if self.is_fresh(key)]
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            temp_filepath = self.cache_filepath + '.tmp'
+            with open(temp_filepath, 'w') as jsf:
+                json.dump(self.entries, jsf)
+            replace_file(temp_filepath, self.cache_filepath)
+            self._dirty = False
+
+    def __repr__(self):
+        return "PersistentEntityCache {} with {} records".format(self.name, len(self.entries))
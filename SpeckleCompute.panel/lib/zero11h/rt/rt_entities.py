@@ -88,6 +88,8 @@ class API_Entity(object):
                                'process_type_codes': 'process_type_codes'},
             'TemplateType':   {'code': 'id',
                                'description': 'description',
+                               # Associated ExecutionUnitType code, what associated-eutype?eu_type= filters by
+                               'eu_type': 'eu_type',
                                'process_types': 'process_types'
                                },
             'ProcessType':    {'code': 'id',
@@ -373,14 +375,22 @@ class TemplateType(API_Entity):
     def __init__(self, json_dict):
         self.entity = 'TemplateType'
         super(TemplateType, self).__init__(json_dict, attribute_map=self.maps.get(self.entity))
+        self._process_types_by_id = None
+
+    @property
+    def process_types_by_id(self):
+        """ProcessTypes by id, built on first use"""
+        if self._process_types_by_id is None:
+            process_types_by_id = {}
+            for item in self.process_types or []:
+                process_type = ProcessType(item.get('process_type'))
+                process_type.operation_number = item.get('operation_number')
+                process_types_by_id.setdefault(process_type.id, process_type)
+            self._process_types_by_id = process_types_by_id
+        return self._process_types_by_id
 
     def get_process_type(self, process_type_id=None):
-        for item in self.process_types:
-            process_type = ProcessType(item.get('process_type'))
-            process_type.operation_number = item.get('operation_number')
-            if process_type.id == process_type_id:
-                return process_type
-        return None
+        return self.process_types_by_id.get(process_type_id)
 
 
 
@@ -5,35 +5,121 @@
 
 """
 
-from System.Net import WebRequest
-from System.IO import StreamReader
 import sys
 import time
 import json
 import os
 import pprint as pp
-import tempfile
+import threading
+import traceback
 from abc import ABCMeta, abstractmethod, abstractproperty
 
 # por Fallo de codificación de la petición de materials al cache de disco en json
 # http://farmdev.com/talks/unicode/
-sys.setdefaultencoding('utf-8')
-# Ojo, con Irontpython 3 no funciona
+# Ojo, con Irontpython 3 y CPython no existe
 # Exception : System.MissingMemberException: 'module' object has no attribute 'setdefaultencoding'
-
-
-from ConfigParser import ConfigParser
+if hasattr(sys, 'setdefaultencoding'):
+    sys.setdefaultencoding('utf-8')
+
+try:
+    from ConfigParser import ConfigParser  # IronPython 2.7
+except ImportError:
+    from configparser import ConfigParser
+
+from .parallel import DEFAULT_MAX_WORKERS, SingleFlight, map_bounded
+from .metrics import METRICS, endpoint_name
+from .rate_limiter import RateLimiter
+from .rt_cache import (PersistentEntityCache, cache_key, get_cache_folder, get_record_index, load_json_file,
+                       merge_records, remember_json_file, replace_file)
+from .snapshot import SnapshotRequestHandler, load_snapshot
+from .templates import TemplateRegistry
+from .transport import ThrottledError, get_default_transport
 
 config_data = ConfigParser()
 config_data.optionxform = str
 
-module_path = '\\'.join(__file__.split('\\')[:-1])
+module_path = os.path.dirname(os.path.abspath(__file__))
 config_data.read(os.path.join(module_path, 'config.ini'))
 
-COMPONENT_DATA__TREE = {}
-COMPONENT_DATA__FULL = {}
-MATERIAL_DATA = {}
-TEMPLATES_ACCESSED = {}  # eu_type_id: template_data
+# Persisted in the RT cache folder so a new pyRevit engine starts with warm data. See get_cache_folder
+COMPONENT_DATA__TREE = PersistentEntityCache('component-type_tree')
+COMPONENT_DATA__FULL = PersistentEntityCache('component-type_full')
+MATERIAL_DATA = PersistentEntityCache('material')
+TEMPLATES_ACCESSED = PersistentEntityCache('template-type')  # eu_type_id: template_data
+TEMPLATE_REGISTRY = TemplateRegistry(PersistentEntityCache('template-type_all'))  # Every template, by eu_type
+TEMPLATE_TYPE_ENTITY = 'template_type/template-type'
+
+MAX_URL_LENGTH = 2000  # Keep request URLs below the usual server/proxy limits
+
+MAX_RETRIES = 3  # On 429/503 responses
+
+# Shared by rt_request and rt_constr_request, they hit the same API
+RATE_LIMITER = RateLimiter()
+
+# Concurrent requests per handler call. 1 fetches sequentially
+MAX_WORKERS = DEFAULT_MAX_WORKERS
+if config_data.has_option('011h_API', 'MAX_WORKERS'):
+    MAX_WORKERS = config_data.getint('011h_API', 'MAX_WORKERS')
+
+# Entity lists in TempCacheData are refetched after TEMP_CACHE_TTL seconds. Until they are
+# MAX_STALENESS seconds older than that they are still served while a background request refreshes
+# them (stale-while-revalidate). 0 always waits for the refetch
+TEMP_CACHE_TTL = 3600
+MAX_STALENESS = 24 * 3600
+if config_data.has_option('011h_API', 'MAX_STALENESS'):
+    MAX_STALENESS = config_data.getint('011h_API', 'MAX_STALENESS')
+
+# Delta sync: cached entities are refreshed asking only for the records changed since their last
+# sync, filtering by UPDATED_FIELD. A full refetch still happens when the last full fetch is older
+# than MAX_DELTA_AGE, so records deleted in RT do not linger
+DELTA_SYNC = True
+if config_data.has_option('011h_API', 'DELTA_SYNC'):
+    DELTA_SYNC = config_data.getboolean('011h_API', 'DELTA_SYNC')
+UPDATED_FIELD = 'updated_at'
+MAX_DELTA_AGE = 7 * 24 * 3600
+SYNC_OVERLAP = 300  # Seconds asked for again before the last sync, for clock skew with RT
+SYNC_STATE = PersistentEntityCache('sync-state', ttl=MAX_DELTA_AGE)  # entity: last sync start time
+FULL_SYNC_STATE = PersistentEntityCache('full-sync-state', ttl=MAX_DELTA_AGE)  # entity: last full fetch start time
+
+# System.Net inside Revit, urllib under CPython. Shared so .NET pools connections for both handlers
+TRANSPORT = get_default_transport()
+
+
+def chunk_ids(base_url, ids, max_url_length=MAX_URL_LENGTH, separator=','):
+    """
+    Split ids in chunks so base_url + separator joined ids stays below max_url_length
+
+    Returns:
+        List[List[str]]
+    """
+    chunks = []
+    chunk = []
+    length = len(base_url)
+    for cid in ids:
+        id_length = len(cid) + len(separator)
+        if chunk and length + id_length > max_url_length:
+            chunks.append(chunk)
+            chunk = []
+            length = len(base_url)
+        chunk.append(cid)
+        length += id_length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def format_sync_time(timestamp):
+    """UTC ISO 8601 time SYNC_OVERLAP seconds before timestamp, for UPDATED_FIELD filters"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp - SYNC_OVERLAP))
+
+
+def normalize_url(req_url):
+    """req_url with its query parameters sorted, so equivalent requests compare equal"""
+    if '?' not in req_url:
+        return req_url
+    base_url, query = req_url.split('?', 1)
+    return '{}?{}'.format(base_url, '&'.join(sorted(query.split('&'))))
+
 
 class Verbosity(object):
     """verbosity enum like object. Do not instantiate"""
@@ -57,50 +143,90 @@ class ICacheData():
     def set_cached_data(self, data=None):
         pass
 
+    def get_stale_data(self):
+        """Expired data still good enough to serve while it is refreshed. None by default"""
+        return None
+
+    def get_last_data(self):
+        """Cached data whatever its age, to merge a delta sync into. None by default"""
+        return None
+
 
 class TempCacheData(ICacheData):
-    def __init__(self, entity=None):
+    def __init__(self, entity=None, ttl=None, max_staleness=None):
         self.entity = entity
-        self.temp_folder = tempfile.gettempdir()
+        self.ttl = TEMP_CACHE_TTL if ttl is None else ttl
+        self.max_staleness = MAX_STALENESS if max_staleness is None else max_staleness
+        self.temp_folder = get_cache_folder()
         cache_jsonfilepath = 'temp_RT_data_{}.json'.format(self.entity.split('/')[-1])
         self.cache_filepath = os.path.join(self.temp_folder, cache_jsonfilepath)
 
+    def get_age(self):
+        """Seconds since the cache file was written, None if there is no cache file"""
+        try:
+            return time.time() - os.path.getmtime(self.cache_filepath)
+        except (IOError, OSError):  # Missing, or being replaced by a background revalidation
+            return None
+
+    def _load(self, max_age=None):
+        """Cache file data if it is younger than max_age seconds, None if missing, old or corrupted"""
+        age = self.get_age()
+        if age is None or (max_age is not None and age >= max_age):
+            return None
+        try:
+            return load_json_file(self.cache_filepath)
+        except (IOError, OSError, ValueError):  # Gone since get_age or corrupted. Fetch it again
+            return None
+
     def get_cached_data(self):
-        if os.path.exists(self.cache_filepath):
-            # print('Reading from cache at:{}'.format(self.cache_filepath))
-            file_time = os.path.getmtime(self.cache_filepath)
-            current_time = time.time()
-            if current_time - file_time < 3600:
-                with open(self.cache_filepath, 'r') as temp_jsf:
-                    return json.load(temp_jsf)
+        # print('Reading from cache at:{}'.format(self.cache_filepath))
+        return self._load(max_age=self.ttl)
 
+    def get_stale_data(self):
+        return self._load(max_age=self.ttl + self.max_staleness)
 
-        return None
+    def get_last_data(self):
+        return self._load()
 
     def set_cached_data(self, data=None):
         # print('Setting cache at:{}'.format(self.cache_filepath))
-        with open(self.cache_filepath, 'w+') as temp_jsf:
-            json.dump(data, temp_jsf, ensure_ascii=False, encoding='utf-8')
+        # Written aside and moved over the cache file so readers never see a half written file
+        temp_filepath = '{}.{}.tmp'.format(self.cache_filepath, threading.current_thread().ident)
+        with open(temp_filepath, 'w+') as temp_jsf:
+            json.dump(data, temp_jsf)
+        replace_file(temp_filepath, self.cache_filepath)
+        remember_json_file(self.cache_filepath, data)
 
 
 class StaticCacheData(ICacheData):
     """
-    Static cache for when RT is down
+    Static cache for when RT is down.
+    Loose per-entity files. Prefer a snapshot bundle (SPECKLE_COMPUTE_RT_SNAPSHOT, see snapshot.py)
     """
     def __init__(self, entity=None):
         self.entity = entity
-        self.temp_folder = os.path.join('\\'.join(__file__.split('\\')[:-1]), 'rt-http_cache')
+        self.temp_folder = os.path.join(module_path, 'rt-http_cache')
         cache_jsonfilepath = 'temp_RT_data_{}.json'.format(self.entity.split('/')[-1])
         self.cache_filepath = os.path.join(self.temp_folder, cache_jsonfilepath)
 
     def get_cached_data(self):
-        with open(self.cache_filepath, 'r') as temp_jsf:
-            return json.load(temp_jsf)
+        return load_json_file(self.cache_filepath)
 
     def set_cached_data(self, c_data=None):
         return  # we do nothing
 
 
+# Background refreshes of stale TempCacheData by entity
+REVALIDATIONS = {}
+_REVALIDATIONS_LOCK = threading.Lock()
+
+
+def wait_for_revalidations(timeout=None):
+    """Blocks until background cache refreshes end, ie: before a pyRevit engine shuts down"""
+    for thread in list(REVALIDATIONS.values()):
+        thread.join(timeout)
+
+
 class Api011hRequestHandler(object):
     """
     011h API Request Handler
@@ -112,7 +238,11 @@ class Api011hRequestHandler(object):
                  api_token=False,
                  debug=False,
                  cache_handler=TempCacheData,
-                 reset_cache=False):
+                 reset_cache=False,
+                 rate_limiter=None,
+                 max_workers=None,
+                 transport=None,
+                 metrics=None):
         self._api_key = api_key
         self._api_token = api_token
         assert self._api_key, "No api-key provided. Cannot initialize connection"
@@ -121,26 +251,64 @@ class Api011hRequestHandler(object):
         self.debug = debug
         self.cache_handler = cache_handler
         self.reset_cache = reset_cache
+        self.rate_limiter = rate_limiter or RATE_LIMITER
+        self.max_workers = max_workers or MAX_WORKERS
+        self.max_url_length = MAX_URL_LENGTH
+        self.transport = transport or TRANSPORT
+        self.transport.allow_connections(self.max_workers)
+        self.metrics = metrics or METRICS
+        self.in_flight = SingleFlight()
+        self.delta_sync = DELTA_SYNC
+
+    def _send_request(self, req_url=None):
+        """
+        GET req_url honouring the shared rate limiter. Returns the response text.
+        Retries MAX_RETRIES times when the API answers 429/503, waiting for its Retry-After.
+        """
+        headers = {'x-api-key': self._api_key, 'x-api-token': self._api_token}
+        endpoint = endpoint_name(req_url, self.url)
+        for attempt in range(MAX_RETRIES + 1):
+            self.metrics.record_wait(endpoint, self.rate_limiter.acquire())
+            start = time.time()
+            try:
+                result = self.transport.get(req_url, headers=headers)
+            except ThrottledError as ex:
+                self.metrics.record_request(endpoint, time.time() - start, error=True)
+                self.metrics.record_throttled(endpoint)
+                if attempt == MAX_RETRIES:
+                    raise
+                self.rate_limiter.throttle(retry_after=ex.retry_after)
+                continue
+            except Exception:
+                self.metrics.record_request(endpoint, time.time() - start, error=True)
+                raise
+            self.metrics.record_request(endpoint, time.time() - start, nbytes=len(result))
+            self.rate_limiter.success()
+            return result
 
     def get_request(self, req_url=None):
+        """
+        Parsed data of req_url. Concurrent calls for the same normalized URL share one request
+        and its parsed result
+        """
+        c_data, shared = self.in_flight.do(normalize_url(req_url), lambda: self._get_request(req_url))
+        if shared:
+            self.metrics.record_coalesced(endpoint_name(req_url, self.url))
+        return c_data
+
+    def _get_request(self, req_url=None):
         # print(req_url)
         # print('URL is {} chars long'.format(len(req_url)))
-        time.sleep(0.5)
-        request = WebRequest.Create(req_url)
-        request.ContentType = "application/json"
-        request.Headers.Add('x-api-key', self._api_key)
-        request.Headers.Add('x-api-token', self._api_token)
-        request.Method = "GET"
-        response = request.GetResponse()
-        result = StreamReader(response.GetResponseStream()).ReadToEnd()
-        data = json.loads(result, encoding='utf-16')
+        data = json.loads(self._send_request(req_url=req_url))
         # print('req data is of type:{}'.format(type(data)))
         # print(data)
         if isinstance(data, dict):  # RT now return object with data and error fields.
             # if data.get('error'):
             #     raise RuntimeError('get_request ERROR: {}'.format(data.get('error')))
             c_data = data.get('data')
-            if not data.get('data'):  # el endpoint de materials por id devuelve un diccionario directamente
+            if isinstance(c_data, list):  # Empty lists too, ie: a delta sync with no changes
+                return c_data
+            if not c_data:  # el endpoint de materials por id devuelve un diccionario directamente
                 c_data = [data]
         else:
             c_data = data
@@ -160,46 +328,215 @@ class Api011hRequestHandler(object):
 
     def cache_data(self, entity=None, ids=None, debug=False):
         cache_handler_instance= self.cache_handler(entity=entity)
-        if cache_handler_instance.get_cached_data() and not self.reset_cache:
-            return cache_handler_instance.get_cached_data()
-        data = self.get_request(req_url=self._form_url(parameters="", entity=entity))
-        cache_handler_instance.set_cached_data(data=data)
+        if not self.reset_cache:
+            cached_data = cache_handler_instance.get_cached_data()
+            if cached_data:
+                self.metrics.record_cache(entity, hits=1)
+                return cached_data
+            stale_data = cache_handler_instance.get_stale_data()
+            if stale_data:
+                self.metrics.record_cache(entity, hits=1)
+                self.revalidate(entity, cache_handler_instance)
+                return stale_data
+        self.metrics.record_cache(entity, misses=1)
+        return self._refresh_cache(entity, cache_handler_instance)
+
+    def _refresh_cache(self, entity, cache_handler_instance):
+        sync_start = time.time()
+        data = None
+        if self.delta_sync and not self.reset_cache:
+            data, _ = self._delta_refresh(entity, cache_handler_instance)
+        full = data is None
+        if full:
+            data = self.get_request(req_url=self._form_url(parameters="", entity=entity))
+        self._set_synced_data(entity, cache_handler_instance, data, sync_start, full=full)
         return data
 
+    def _set_synced_data(self, entity, cache_handler_instance, data, sync_start, full=False):
+        cache_handler_instance.set_cached_data(data=data)
+        SYNC_STATE[entity] = sync_start
+        SYNC_STATE.save()
+        if full:
+            FULL_SYNC_STATE[entity] = sync_start
+            FULL_SYNC_STATE.save()
+
+    def get_changed(self, entity=None, since=None, parameters=''):
+        """
+        Records of entity changed after since (a time.time() timestamp). parameters are the query
+        parameters, '&' terminated, of the request that fetched the cached records, so the changed
+        ones come in the same shape
+        """
+        req_url = '{}{}?{}{}=gt:{}'.format(self.url, entity, parameters, UPDATED_FIELD, format_sync_time(since))
+        return self.get_request(req_url=req_url) or []
+
+    def _delta_refresh(self, entity, cache_handler_instance):
+        """
+        Cached list of entity with the records changed since its last sync merged in, and the
+        number of those records. None, None when a full fetch is needed: the list was never synced
+        or its last full fetch is older than MAX_DELTA_AGE
+        """
+        since = SYNC_STATE.get(entity)
+        if since is None or FULL_SYNC_STATE.get(entity) is None:
+            return None, None
+        last_data = cache_handler_instance.get_last_data()
+        if last_data is None:
+            return None, None
+        try:
+            changed = self.get_changed(entity=entity, since=since,
+                                       parameters='verbosity={}&'.format(self.verbosity))  # As _form_url
+        except Exception:
+            print('RT delta sync {} ERROR:\n{}'.format(entity, traceback.format_exc()))
+            return None, None
+        key_field = 'id' if 'material' in entity else 'code'
+        return merge_records(last_data, changed, key_field), len(changed)
+
+    def sync_entity_list(self, entity):
+        """
+        Merge into the cached list of entity, fresh or not, the records changed since its last sync.
+
+        Returns:
+            int: number of changed records. None if the list cannot be delta synced
+        """
+        sync_start = time.time()
+        cache_handler_instance = self.cache_handler(entity=entity)
+        data, changed = self._delta_refresh(entity, cache_handler_instance)
+        if data is None:
+            return None
+        self._set_synced_data(entity, cache_handler_instance, data, sync_start)
+        return changed
+
+    def sync_entity_cache(self, entity, cached_data_dict, key_field='code', model_type=None, by_id=False):
+        """
+        Revalidate the records of a PersistentEntityCache, expired ones included, with the records
+        changed since the last sync or, the first time, since its oldest record was fetched.
+        Records last fetched in full more than MAX_DELTA_AGE ago are dropped and fetched again.
+
+        Component types are asked for with their model_type, like get_components does. by_id
+        caches, like materials, hold {entity}/{id} answers: their changed records are only listed
+        to learn which ids changed, and the cached ones are requested again by id.
+
+        Returns:
+            int: number of cached records replaced. None if the delta request failed
+        """
+        state_key = entity if model_type is None else '{}?model_type={}'.format(entity, model_type)
+        since = SYNC_STATE.get(state_key)
+        oldest = cached_data_dict.oldest_timestamp()
+        if oldest is None:
+            return 0  # Nothing cached, nothing to revalidate
+        if since is None or oldest < since:
+            since = oldest  # Records fetched before the last sync were not covered by it
+        sync_start = time.time()
+        parameters = 'model_type={}&'.format(model_type) if model_type else ''
+        try:
+            changed = self.get_changed(entity=entity, since=since, parameters=parameters)
+            if by_id:
+                changed_ids = [record.get(key_field) for record in changed
+                               if cache_key(record.get(key_field)) in cached_data_dict.entries]
+                changed = [record for record in self._get_records_by_id(entity, changed_ids) if record]
+        except Exception:
+            print('RT delta sync {} ERROR:\n{}'.format(state_key, traceback.format_exc()))
+            return None
+        replaced = cached_data_dict.merge_changes(changed, key_field=key_field, timestamp=sync_start,
+                                                  max_age=MAX_DELTA_AGE)
+        cached_data_dict.save()
+        SYNC_STATE[state_key] = sync_start
+        SYNC_STATE.save()
+        return replaced
+
+    def sync(self):
+        """
+        Delta sync every cached entity: component types, materials, segments and partial segments.
+
+        Returns:
+            dict: changed records by entity. None for entities that could not be synced
+        """
+        if not self.delta_sync:
+            return {}
+        changed = {}
+        for model_type, cached_data_dict in (('tree', COMPONENT_DATA__TREE), ('full', COMPONENT_DATA__FULL)):
+            changed['component/component-type?model_type={}'.format(model_type)] = \
+                self.sync_entity_cache('component/component-type', cached_data_dict, 'code', model_type)
+        changed['segment/material'] = self.sync_entity_cache('segment/material', MATERIAL_DATA, 'id', by_id=True)
+        for entity in ('segment/segment', 'segment/partial-segment'):
+            if self.cache_handler(entity=entity).get_cached_data():
+                changed[entity] = 0  # Still fresh
+                continue
+            changed[entity] = self.sync_entity_list(entity)
+        return changed
+
+    def revalidate(self, entity, cache_handler_instance):
+        """
+        Refresh the cached entity list in a background thread, once at a time per entity.
+        Callers keep getting the stale list until the new one replaces the cache file
+        """
+        with _REVALIDATIONS_LOCK:
+            if entity in REVALIDATIONS and REVALIDATIONS[entity].is_alive():
+                return REVALIDATIONS[entity]
+
+            def refresh():
+                try:
+                    self._refresh_cache(entity, cache_handler_instance)
+                except Exception:  # Stale data is served again and the next call retries
+                    print('RT revalidate {} ERROR:\n{}'.format(entity, traceback.format_exc()))
+
+            thread = threading.Thread(target=refresh)
+            thread.daemon = True
+            REVALIDATIONS[entity] = thread
+            thread.start()
+            return thread
+
     def get_components(self, entity=None, ids=None, model_type='tree'):
+        """
+        Component types not yet cached are requested in bulk with a code=in: filter,
+        one request per chunk of ids that fits in MAX_URL_LENGTH
+        """
         if not ids:
             raise IOError('get_components() ERROR: No Component ids provided. Nothing returned')
-        url='{}{}?model_type={}'.format(self.url, entity, model_type)
+        url='{}{}?model_type={}&code=in:'.format(self.url, entity, model_type)
         cached_data_dict = COMPONENT_DATA__TREE if model_type == 'tree' else COMPONENT_DATA__FULL
-        data = []
+        missing = []
         for cid in ids:
-            if cid in cached_data_dict.keys():
-                data.append(cached_data_dict.get(cid))
-                continue
-            url = url + '&code=eq:' + cid
-            cdata = self.get_request(req_url=url)
-            if cdata:
-                data.append(cdata[0])
-                cached_data_dict[cdata[0].get('code')] = cdata[0]
-        return data
+            if cid not in cached_data_dict and cid not in missing:
+                missing.append(cid)
+        self.metrics.record_cache(entity, hits=len(set(ids)) - len(missing), misses=len(missing))
+        chunk_urls = [url + ','.join(chunk) for chunk in chunk_ids(url, missing, self.max_url_length)]
+        # Chunks are fetched concurrently but merged in chunk order, so the cache ends the same
+        for cdata in map_bounded(self.get_request, chunk_urls, max_workers=self.max_workers):
+            for item in cdata or []:
+                if item.get('code'):
+                    cached_data_dict[item.get('code')] = item
+        cached_data_dict.save()
+        return [cached_data_dict.get(cid) for cid in ids if cid in cached_data_dict]
 
     def get_materials(self, entity=None, ids=None):
         if not ids:
             raise IOError('get_materials() ERROR: No Material ids provided. Nothing returned')
-        url='{}{}'.format(self.url, entity)
         cached_data_dict = MATERIAL_DATA
+        missing = []
+        for cid in ids:
+            if cid not in cached_data_dict and cid not in missing:
+                missing.append(cid)
+        self.metrics.record_cache(entity, hits=len(set(ids)) - len(missing), misses=len(missing))
+        fetched = {}
+        for cid, record in zip(missing, self._get_records_by_id(entity, missing)):
+            if record:
+                fetched[cid] = record
+                cached_data_dict[record.get('id')] = record
+        cached_data_dict.save()
         data = []
         for cid in ids:
-            if cid in cached_data_dict.keys():
+            if cid in fetched:
+                data.append(fetched[cid])
+            elif cid in cached_data_dict:
                 data.append(cached_data_dict.get(cid))
-                continue
-            url = '{}/{}'.format(url, cid)
-            cdata = self.get_request(req_url=url)
-            if cdata:
-                data.append(cdata[0])
-                cached_data_dict[cdata[0].get('id')] = cdata[0]
         return data
 
+    def _get_records_by_id(self, entity, ids):
+        """{entity}/{id} record of each id, requested concurrently. None for ids RT has no record of"""
+        urls = ['{}{}/{}'.format(self.url, entity, cid) for cid in ids]
+        return [cdata[0] if cdata else None
+                for cdata in map_bounded(self.get_request, urls, max_workers=self.max_workers)]
+
     def get_data(self, entity=None, ids=None, debug=False):
         data = self.cache_data(entity=entity)
         if not ids:
@@ -207,51 +544,80 @@ class Api011hRequestHandler(object):
         filter_key = 'code'
         if 'material' in entity:
             filter_key = 'id'
-        return [item for item in data if item.get(filter_key) in ids]
+        return get_record_index(data, filter_key).select(ids)
+
+    def get_all_templates(self):
+        return self.get_request(req_url=self._form_url(parameters='', entity=TEMPLATE_TYPE_ENTITY))
 
     def get_template(self, entity=None, eu_type_id=None):
-        if eu_type_id in TEMPLATES_ACCESSED.keys():
+        """
+        Template of eu_type_id from the bulk loaded TEMPLATE_REGISTRY. Execution unit types the
+        registry does not know are requested one by one and kept in TEMPLATES_ACCESSED
+        """
+        template_data = TEMPLATE_REGISTRY.get(eu_type_id, fetch_all=self.get_all_templates)
+        if template_data is not None:
+            self.metrics.record_cache(entity, hits=1)
+            return template_data
+        if eu_type_id in TEMPLATES_ACCESSED:
+            self.metrics.record_cache(entity, hits=1)
             return TEMPLATES_ACCESSED.get(eu_type_id)
+        self.metrics.record_cache(entity, misses=1)
         template_url = '{}{}{}'.format(self.url,
                                        entity,
                                        '?eu_type={}'.format(eu_type_id))
         data = self.get_request(req_url=template_url)
         if not data:
             return None
+        TEMPLATES_ACCESSED[eu_type_id] = data[0]
+        TEMPLATES_ACCESSED.save()
         return data[0]
 
 
 class api011h_request(object):
     """
     011h API requests interface class
+
+    The time spent in every call is recorded in metrics, see metrics.RTMetrics
     """
-    def __init__(self, handler=None):
+    def __init__(self, handler=None, metrics=None):
         self.handler = handler
         self.handler.verbosity = Verbosity.RECURSIVE
+        self.metrics = metrics or METRICS
 
     def get_component_types(self, ids=None, model_type='tree'):
         # return self.handler.get_data(entity='component/component-type', ids=ids)
-        return self.handler.get_components(entity='component/component-type',
-                                           ids=ids,
-                                           model_type=model_type)
+        with self.metrics.call('get_component_types'):
+            return self.handler.get_components(entity='component/component-type',
+                                               ids=ids,
+                                               model_type=model_type)
 
     def get_materials(self, ids=None):
         # return self.handler.get_data(entity='segment/material', ids=ids)
-        return self.handler.get_materials(entity='segment/material', ids=ids)
+        with self.metrics.call('get_materials'):
+            return self.handler.get_materials(entity='segment/material', ids=ids)
 
     # TODO: cleanup and refactor cache after 230511 changes
     def get_segments(self, ids=None):
-        return self.handler.get_data(entity='segment/segment', ids=ids)
+        with self.metrics.call('get_segments'):
+            return self.handler.get_data(entity='segment/segment', ids=ids)
 
     def get_partial_segments(self, ids=None):
-        return self.handler.get_data(entity='segment/partial-segment', ids=ids)
+        with self.metrics.call('get_partial_segments'):
+            return self.handler.get_data(entity='segment/partial-segment', ids=ids)
 
     def get_view_templates(self, ids=None):
-        return self.handler.get_data(entity='segment/view-template', ids=ids)
+        with self.metrics.call('get_view_templates'):
+            return self.handler.get_data(entity='segment/view-template', ids=ids)
+
+    def sync(self):
+        """Bring cached RT data up to date requesting only what changed. See Api011hRequestHandler.sync"""
+        with self.metrics.call('sync'):
+            return self.handler.sync()
 
     def get_template_from_execution_unit_id(self, eu_type_id=None):
-        return self.handler.get_template(entity="template_type/template-type/associated-eutype",
-                                         eu_type_id=eu_type_id)
+        with self.metrics.call('get_template_from_execution_unit_id'):
+            return self.handler.get_template(entity="template_type/template-type/associated-eutype",
+                                             eu_type_id=eu_type_id)
 
 
 API_KEY = config_data.get('011h_API', 'API_KEY')
@@ -273,3 +639,10 @@ rt_constr_request = api011h_request(handler=Api011hRequestHandler(api_key=API_KE
                                                                   debug=False))
 rt_constr_request.handler.url = CONSTRUCTION_API_URL
 
+# Offline snapshot bundle made with snapshot.export_snapshot. When set rt_request never calls RT
+SNAPSHOT_PATH = os.environ.get('SPECKLE_COMPUTE_RT_SNAPSHOT')
+if not SNAPSHOT_PATH and config_data.has_option('011h_API', 'SNAPSHOT'):
+    SNAPSHOT_PATH = config_data.get('011h_API', 'SNAPSHOT')
+if SNAPSHOT_PATH:
+    rt_request = api011h_request(handler=SnapshotRequestHandler(load_snapshot(SNAPSHOT_PATH)))
+
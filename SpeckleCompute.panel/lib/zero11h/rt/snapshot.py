@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Offline RT snapshot bundles. Pure python
+
+A snapshot is a single gzipped JSON file with every RT record the handlers use, indexed by code
+or id, plus the format version, creation time and source API url. A SnapshotRequestHandler serves
+api011h_request from it without any network access, so CI machines and offline sites start from a
+known dataset.
+
+Usage:
+    snapshot = export_snapshot('rt_snapshot.json.gz', component_type_ids)  # Online, once
+    rt_request = api011h_request(handler=SnapshotRequestHandler(load_snapshot('rt_snapshot.json.gz')))
+
+rt_handler does the latter by itself when SPECKLE_COMPUTE_RT_SNAPSHOT points to a snapshot.
+"""
+
+import gzip
+import json
+import time
+
+from .rt_cache import as_id_list, cache_key
+
+SNAPSHOT_VERSION = 1
+
+COMPONENT_TYPE_ENTITY = 'component/component-type'
+MATERIAL_ENTITY = 'segment/material'
+TEMPLATE_ENTITY = 'template_type/template-type/associated-eutype'
+DATA_ENTITIES = ('segment/segment', 'segment/partial-segment', 'segment/view-template')
+MODEL_TYPES = ('tree', 'full')
+
+
+def component_type_entity(model_type='tree'):
+    return '{}?model_type={}'.format(COMPONENT_TYPE_ENTITY, model_type)
+
+
+class RTSnapshot(object):
+    """
+    RT records grouped by entity. Each entity keeps its records in order and an index of their
+    positions by key
+    """
+    def __init__(self, data=None, filepath=None):
+        data = data or {}
+        self.filepath = filepath
+        self.version = data.get('version', SNAPSHOT_VERSION)
+        self.created = data.get('created', time.time())
+        self.info = data.get('info', {})
+        self.entities = data.get('entities', {})
+
+    @property
+    def age(self):
+        """Seconds since the snapshot was exported"""
+        return time.time() - self.created
+
+    def add(self, entity, key, record):
+        entity_data = self.entities.setdefault(entity, {'records': [], 'index': {}})
+        key = cache_key(key)
+        if key in entity_data['index']:
+            entity_data['records'][entity_data['index'][key]] = record
+            return
+        entity_data['index'][key] = len(entity_data['records'])
+        entity_data['records'].append(record)
+
+    def add_records(self, entity, records, key_field='code'):
+        for record in records or []:
+            self.add(entity, record.get(key_field), record)
+
+    def get(self, entity, key, default=None):
+        entity_data = self.entities.get(entity)
+        if not entity_data:
+            return default
+        position = entity_data['index'].get(cache_key(key))
+        if position is None:
+            return default
+        return entity_data['records'][position]
+
+    def records(self, entity):
+        return list(self.entities.get(entity, {}).get('records', []))
+
+    def to_dict(self):
+        return {'version': self.version,
+                'created': self.created,
+                'info': self.info,
+                'entities': self.entities}
+
+    def save(self, filepath=None):
+        self.filepath = filepath or self.filepath
+        content = json.dumps(self.to_dict(), sort_keys=True)
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        with gzip.open(self.filepath, 'wb') as snapshot_file:
+            snapshot_file.write(content)
+        return self.filepath
+
+    def __repr__(self):
+        return "RTSnapshot v{} created {} with {}".format(
+            self.version,
+            time.strftime('%Y-%m-%d %H:%M', time.localtime(self.created)),
+            ', '.join(['{} {}'.format(len(entity_data['records']), entity)
+                       for entity, entity_data in sorted(self.entities.items())]))
+
+
+def load_snapshot(filepath):
+    """
+    Raises:
+        ValueError: if the snapshot format is newer than this code understands
+    """
+    with gzip.open(filepath, 'rb') as snapshot_file:
+        data = json.loads(snapshot_file.read().decode('utf-8'))
+    if data.get('version') != SNAPSHOT_VERSION:
+        raise ValueError('RT snapshot {} has version {}, expected {}'.format(filepath,
+                                                                            data.get('version'),
+                                                                            SNAPSHOT_VERSION))
+    return RTSnapshot(data, filepath=filepath)
+
+
+def export_snapshot(filepath, component_type_ids, request=None, info=None):
+    """
+    Fetch component_type_ids, in both model types, and every material and template they reference,
+    plus the full segment, partial segment and view template lists, and save them as a snapshot.
+
+    Returns:
+        RTSnapshot
+    """
+    from .prefetch import get_execution_unit_type_ids, get_material_ids
+    from .rt_handler import rt_request
+    request = request or rt_request
+
+    snapshot = RTSnapshot()
+    snapshot.info = dict(info or {})
+    snapshot.info['api_url'] = request.handler.url
+
+    type_ids = sorted(set([type_id for type_id in component_type_ids if type_id]))
+    material_ids = set()
+    eu_type_ids = set()
+    for model_type in MODEL_TYPES:
+        component_types = request.get_component_types(ids=type_ids, model_type=model_type) if type_ids else []
+        snapshot.add_records(component_type_entity(model_type), component_types, key_field='code')
+        for component_type_data in component_types:
+            material_ids.update(get_material_ids(component_type_data))
+            eu_type_ids.update(get_execution_unit_type_ids(component_type_data))
+
+    material_ids = sorted([material_id for material_id in material_ids if material_id])
+    if material_ids:
+        snapshot.add_records(MATERIAL_ENTITY, request.get_materials(ids=material_ids), key_field='id')
+    for eu_type_id in sorted([eu_type_id for eu_type_id in eu_type_ids if eu_type_id]):
+        template_data = request.get_template_from_execution_unit_id(eu_type_id=eu_type_id)
+        if template_data:
+            snapshot.add(TEMPLATE_ENTITY, eu_type_id, template_data)
+    for entity in DATA_ENTITIES:
+        snapshot.add_records(entity, request.handler.cache_data(entity=entity), key_field='code')
+
+    snapshot.save(filepath)
+    return snapshot
+
+
+class SnapshotRequestHandler(object):
+    """
+    Drop in replacement of Api011hRequestHandler that answers from an RTSnapshot.
+    Ids missing from the snapshot are left out of the results, like the API does
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.url = snapshot.info.get('api_url')
+        self.verbosity = None
+        self.max_workers = 1  # Nothing to wait for
+        self.reset_cache = False
+
+    def _get_many(self, entity, ids):
+        data = []
+        for cid in ids:
+            record = self.snapshot.get(entity, cid)
+            if record is not None:
+                data.append(record)
+        return data
+
+    def cache_data(self, entity=None, ids=None, debug=False):
+        return self.snapshot.records(entity)
+
+    def get_components(self, entity=None, ids=None, model_type='tree'):
+        if not ids:
+            raise IOError('get_components() ERROR: No Component ids provided. Nothing returned')
+        return self._get_many(component_type_entity(model_type), ids)
+
+    def get_materials(self, entity=None, ids=None):
+        if not ids:
+            raise IOError('get_materials() ERROR: No Material ids provided. Nothing returned')
+        return self._get_many(entity, ids)
+
+    def get_data(self, entity=None, ids=None, debug=False):
+        records = self.snapshot.records(entity)
+        if not ids:
+            return records
+        # Same order as the API list, like Api011hRequestHandler.get_data
+        index = self.snapshot.entities.get(entity, {}).get('index', {})
+        positions = set([index[cache_key(cid)] for cid in as_id_list(ids) if cache_key(cid) in index])
+        return [record for position, record in enumerate(records) if position in positions]
+
+    def get_template(self, entity=None, eu_type_id=None):
+        return self.snapshot.get(entity, eu_type_id)
+
+    def sync(self):
+        return {}  # A snapshot is a fixed dataset
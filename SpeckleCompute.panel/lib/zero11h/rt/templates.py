@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Execution unit template registry. Pure python
+
+RT answers template_type/template-type with every template type in one request. The registry
+loads that list once, persists it with the rest of the RT cache, and indexes it by the execution
+unit type each template is associated with, so get_template_from_execution_unit_id is a dict
+lookup instead of a request per execution unit type.
+"""
+
+import threading
+import traceback
+
+from .rt_cache import PersistentEntityCache, cache_key
+
+# Field of a template type record with its associated execution unit type code. See the TemplateType
+# map in rt_entities
+TEMPLATE_EU_TYPE_FIELD = 'eu_type'
+
+
+def get_template_eu_type_id(template_data):
+    """Associated execution unit type code. The whole record with recursive verbosity"""
+    eu_type = template_data.get(TEMPLATE_EU_TYPE_FIELD)
+    if isinstance(eu_type, dict):
+        return eu_type.get('code')
+    return eu_type
+
+
+class TemplateRegistry(object):
+    """
+    Template type records by code, loaded in bulk on first use, and their index by execution unit
+    type.
+
+    Usage:
+        registry = TemplateRegistry()
+        template_data = registry.get(eu_type_id, fetch_all=lambda: handler.get_request(url))
+    """
+    def __init__(self, records=None):
+        self.records = records if records is not None else PersistentEntityCache('template-type_all')
+        self._by_eu_type = None
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self._by_eu_type is not None
+
+    def load(self, fetch_all):
+        """
+        Index the persisted records or, if there are none or they expired, the ones fetch_all returns.
+        If fetch_all fails the registry stays empty for the session and callers fall back to
+        requesting each execution unit template
+        """
+        with self._lock:
+            if self.loaded:
+                return
+            if not len(self.records):
+                try:
+                    fetched = fetch_all() or []
+                except Exception:
+                    print('RT template registry ERROR:\n{}'.format(traceback.format_exc()))
+                    self._by_eu_type = {}
+                    return
+                self.records.clear()
+                for template_data in fetched:
+                    self.records[template_data.get('code')] = template_data
+                self.records.save()
+            self.reindex()
+
+    def reindex(self):
+        with self._lock:
+            by_eu_type = {}
+            for code in sorted(self.records.keys()):
+                template_data = self.records.get(code)
+                eu_type_id = get_template_eu_type_id(template_data)
+                if eu_type_id is not None:
+                    by_eu_type.setdefault(cache_key(eu_type_id), template_data)
+            if len(self.records) and not by_eu_type:
+                print('RT template registry WARNING: no template type has {}. Templates are requested '
+                      'by execution unit type'.format(TEMPLATE_EU_TYPE_FIELD))
+            self._by_eu_type = by_eu_type
+
+    def get(self, eu_type_id, fetch_all=None):
+        """Template type record associated to eu_type_id, None if the registry does not know it"""
+        if not self.loaded and fetch_all is not None:
+            self.load(fetch_all)
+        return (self._by_eu_type or {}).get(cache_key(eu_type_id))
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self.records.save()
+            self._by_eu_type = None
+
+    def __len__(self):
+        return len(self._by_eu_type or {})
+
+    def __repr__(self):
+        return "TemplateRegistry {} templates for {} execution unit types".format(len(self.records),
+                                                                                   len(self))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+HTTP transports for the 011h API
+
+Api011hRequestHandler only needs GET requests returning the response text. DotNetTransport does
+them with System.Net inside Revit (IronPython). UrllibTransport uses the standard library so the
+RT client, its caches and the mock server in mock_server.py run under CPython on any platform.
+"""
+
+import zlib
+
+try:
+    from System.Net import WebRequest, WebException, DecompressionMethods
+    from System.IO import StreamReader
+    from System.Text import Encoding
+except ImportError:
+    WebRequest = None  # CPython, no System.Net. UrllibTransport only
+
+try:
+    from urllib.request import Request, urlopen  # Python 3
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import Request, urlopen, HTTPError
+
+from .rate_limiter import parse_retry_after
+
+THROTTLE_STATUS_CODES = (429, 503)
+TIMEOUT = 100  # Seconds. Same as the .NET WebRequest default
+
+
+class ThrottledError(Exception):
+    """The API answered 429/503. retry_after are the seconds asked for in Retry-After, if any"""
+    def __init__(self, status_code, retry_after=None):
+        super(ThrottledError, self).__init__('RT throttled the request with {}'.format(status_code))
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class DotNetTransport(object):
+    """
+    System.Net transport. Keeps connections alive and lets .NET negotiate gzip/deflate and
+    inflate the body on the fly
+    """
+    def __init__(self):
+        assert WebRequest is not None, "System.Net is not available. Use UrllibTransport"
+        self.max_connections = None
+
+    def allow_connections(self, max_connections):
+        """
+        Let .NET keep max_connections keep-alive connections open to the RT host.
+        The default outside ASP.NET is 2, which would serialize concurrent fetches again. Only the
+        service point of each requested host is changed, other add-ins keep the process defaults
+        """
+        self.max_connections = max(self.max_connections or 0, max_connections)
+
+    def get(self, url, headers=None):
+        request = WebRequest.Create(url)
+        request.ContentType = "application/json"
+        for name, value in sorted((headers or {}).items()):
+            request.Headers.Add(name, value)
+        request.Method = "GET"
+        if self.max_connections and request.ServicePoint.ConnectionLimit < self.max_connections:
+            request.ServicePoint.ConnectionLimit = self.max_connections
+        # Reuse pooled connections and let .NET send Accept-Encoding and inflate the body
+        request.KeepAlive = True
+        request.AutomaticDecompression = DecompressionMethods.GZip | DecompressionMethods.Deflate
+        try:
+            response = request.GetResponse()
+        except WebException as ex:
+            if ex.Response is None or int(ex.Response.StatusCode) not in THROTTLE_STATUS_CODES:
+                raise
+            throttled = ThrottledError(int(ex.Response.StatusCode),
+                                       parse_retry_after(ex.Response.Headers['Retry-After']))
+            ex.Response.Close()  # Give the connection back to the pool
+            raise throttled
+        try:
+            # Decoded straight from the (already inflated) response stream, no byte buffer copy
+            return StreamReader(response.GetResponseStream(), Encoding.UTF8).ReadToEnd()
+        finally:
+            # Closing the response releases its keep-alive connection for the next request
+            response.Close()
+
+
+def decompress(body, content_encoding=None):
+    """Inflate a gzip or deflate response body"""
+    content_encoding = (content_encoding or '').lower()
+    if content_encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if content_encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:  # Raw deflate stream without zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class UrllibTransport(object):
+    """Standard library transport. Asks for gzip/deflate responses"""
+    def __init__(self, timeout=TIMEOUT):
+        self.timeout = timeout
+
+    def allow_connections(self, max_connections):
+        pass  # urllib opens a connection per request
+
+    def get(self, url, headers=None):
+        request = Request(url)
+        request.add_header('Content-Type', 'application/json')
+        request.add_header('Accept-Encoding', 'gzip, deflate')
+        for name, value in sorted((headers or {}).items()):
+            request.add_header(name, value)
+        try:
+            response = urlopen(request, timeout=self.timeout)
+        except HTTPError as ex:
+            if ex.code not in THROTTLE_STATUS_CODES:
+                raise
+            raise ThrottledError(ex.code, parse_retry_after(ex.headers.get('Retry-After')))
+        try:
+            body = decompress(response.read(), response.headers.get('Content-Encoding'))
+        finally:
+            response.close()
+        return body.decode('utf-8')
+
+
+def get_default_transport():
+    """DotNetTransport inside Revit, UrllibTransport anywhere else"""
+    if WebRequest is not None:
+        return DotNetTransport()
+    return UrllibTransport()
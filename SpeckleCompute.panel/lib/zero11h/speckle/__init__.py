@@ -0,0 +1,5 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Speckle Compute helpers shared by the SpeckleCompute pushbuttons
+"""
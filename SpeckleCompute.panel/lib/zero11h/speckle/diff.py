@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Receive diffing. Pure python
+
+Objects are matched between commits by their Speckle applicationId (stable) and
+compared by their Speckle id (content hash), so only new or changed objects are
+converted again.
+"""
+
+
+class ReceiveDiff(object):
+    """Keys of received objects grouped by what a receive has to do with them"""
+    def __init__(self, new=None, changed=None, unchanged=None, removed=None):
+        self.new = new or []
+        self.changed = changed or []
+        self.unchanged = unchanged or []
+        self.removed = removed or []
+
+    @property
+    def to_convert(self):
+        return self.new + self.changed
+
+    @property
+    def to_delete(self):
+        return self.changed + self.removed
+
+    def __repr__(self):
+        return "ReceiveDiff new:{} changed:{} unchanged:{} removed:{}".format(len(self.new),
+                                                                             len(self.changed),
+                                                                             len(self.unchanged),
+                                                                             len(self.removed))
+
+
+def object_key(speckle_object):
+    """applicationId of a Speckle object, or its id when it was created without one"""
+    return speckle_object.applicationId or speckle_object.id
+
+
+def key_received_objects(speckle_objects):
+    """
+    Received objects by object_key. Objects sharing an applicationId, like several compute outputs
+    of one source element, get its position among them as suffix, {applicationId}#{n}, so none of
+    them is left out
+
+    Returns:
+        Dict[key, speckle_object]
+    """
+    speckle_objects = list(speckle_objects)
+    counts = {}
+    for speckle_object in speckle_objects:
+        key = object_key(speckle_object)
+        counts[key] = counts.get(key, 0) + 1
+    keyed = {}
+    positions = {}
+    for speckle_object in speckle_objects:
+        key = object_key(speckle_object)
+        if counts[key] > 1:
+            positions[key] = positions.get(key, -1) + 1
+            key = '{}#{}'.format(key, positions[key])
+        keyed[key] = speckle_object
+    return keyed
+
+
+def diff_received_objects(received, existing):
+    """
+    Args:
+        received: Dict[key, speckle_id] of the objects in the commit being received
+        existing: Dict[key, speckle_id] recorded on the elements already in the model
+
+    Returns:
+        ReceiveDiff
+    """
+    diff = ReceiveDiff()
+    for key in sorted(received.keys()):
+        if key not in existing:
+            diff.new.append(key)
+        elif existing[key] != received[key]:
+            diff.changed.append(key)
+        else:
+            diff.unchanged.append(key)
+    diff.removed = sorted([key for key in existing.keys() if key not in received])
+    return diff
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+011h extensible storage metadata as structured Speckle objects
+
+Sending the metadata JSON string gives the whole string a new hash whenever any byte of it changes.
+Mapping it to Base objects, with the bulky sections detached, lets Speckle content hashing
+de-duplicate the sections that did not change across commits and LayerGroups.
+"""
+
+from zero11h.speckle import session  # References the Speckle assemblies
+from Speckle.Core.Models import Base
+
+DETACHED_SECTIONS = ('GeometryData', 'JoinData', 'PerforatorData', 'LayerTypeData')
+
+
+def is_valid_member_name(name):
+    """Speckle does not allow '.' or '/' in Base member names, nor names starting with '@'"""
+    return bool(name) and '.' not in name and '/' not in name and not name.startswith('@')
+
+
+def to_base(value):
+    """
+    Converts json like python data to Speckle data.
+
+    Dicts become Base objects with their keys as members, inserted in sorted order so the same
+    data always serializes, and hashes, the same. Dicts with keys that are not valid member names
+    (ie: JoinData keys, that have dots) become a Base with a sorted list of key/value entries.
+    """
+    if isinstance(value, dict):
+        base = Base()
+        keys = sorted(value.keys())
+        if all([is_valid_member_name(key) for key in keys]):
+            for key in keys:
+                base[key] = to_base(value[key])
+        else:
+            entries = []
+            for key in keys:
+                entry = Base()
+                entry['key'] = key
+                entry['value'] = to_base(value[key])
+                entries.append(entry)
+            base['entries'] = entries
+        return base
+    if isinstance(value, (list, tuple)):
+        return [to_base(item) for item in value]
+    return value
+
+
+def _section_to_base(value):
+    if isinstance(value, dict):
+        return to_base(value)
+    section = Base()
+    section['value'] = to_base(value)
+    return section
+
+
+def layer_group_metadata_to_base(metadata_dict):
+    """
+    Args:
+        metadata_dict: LayerGroup extensible storage metadata as loaded from its JSON
+
+    Returns:
+        Base: with the top level metadata (SelfGuid, TimeStamp...) and LayerGroupMetadata members.
+        GeometryData, JoinData, PerforatorData and LayerTypeData are detached Base sub-objects
+    """
+    metadata_base = Base()
+    for key in sorted(metadata_dict.keys()):
+        if key == 'LayerGroupMetadata':
+            continue
+        metadata_base[key] = to_base(metadata_dict[key])
+
+    lg_metadata = metadata_dict.get('LayerGroupMetadata') or {}
+    for key in sorted(lg_metadata.keys()):
+        if key in DETACHED_SECTIONS:
+            metadata_base['@{}'.format(key)] = _section_to_base(lg_metadata[key])
+        else:
+            metadata_base[key] = to_base(lg_metadata[key])
+    return metadata_base
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Perforator outlines for the send path
+"""
+
+from zero11h.revit_api import DB
+import zero11h.revit_api.revit_utils as mru
+
+
+class PerforatorOutlineCache(object):
+    """
+    Outlines of perforator instances, cached in family local coordinates.
+
+    Perforators of the same family type share the same outline. The face outline is extracted
+    once per family type, flip state and detail level and every instance gets its own outline by
+    transforming the cached curves with the instance transform, without any geometry extraction.
+
+    Usage:
+        outlines = PerforatorOutlineCache()
+        curves = outlines.get_outline(perforator)
+    """
+    def __init__(self, view_detail=DB.ViewDetailLevel.Coarse):
+        self.view_detail = view_detail
+        self._local_outlines = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, perforator):
+        return (perforator.Symbol.Id.IntegerValue,
+                int(self.view_detail),
+                perforator.Mirrored,
+                perforator.FacingFlipped,
+                perforator.HandFlipped)
+
+    def _extract_local_outline(self, perforator, transform):
+        solid = mru.RvtSolidUtils.get_all_solids_from_instance(perforator, view_detail=self.view_detail)[0]
+        face = mru.RvtSolidUtils.get_solid_face_from_normal(solid, perforator.FacingOrientation.Negate())
+        inverse = transform.Inverse
+        return [edge.AsCurve().CreateTransformed(inverse) for edge in face.EdgeLoops.Item[0]]
+
+    def get_outline(self, perforator):
+        """
+        Returns:
+            List[DB.Curve]: outline of the perforator face opposite to its facing orientation in model coordinates
+        """
+        transform = perforator.GetTotalTransform()
+        key = self._key(perforator)
+        local_outline = self._local_outlines.get(key)
+        if local_outline is None:
+            self.misses += 1
+            local_outline = self._extract_local_outline(perforator, transform)
+            self._local_outlines[key] = local_outline
+        else:
+            self.hits += 1
+        return [curve.CreateTransformed(transform) for curve in local_outline]
+
+    def __repr__(self):
+        return "PerforatorOutlineCache {} types, hits:{} misses:{}".format(len(self._local_outlines),
+                                                                          self.hits,
+                                                                          self.misses)
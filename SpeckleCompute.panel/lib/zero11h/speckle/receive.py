@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Speckle to Revit receive pipeline
+"""
+
+import time
+
+from zero11h.revit_api import System, DB
+from zero11h.speckle.report import ConversionReport
+
+
+def chunks(items, size):
+    for idx in range(0, len(items), size):
+        yield items[idx:idx + size]
+
+
+class ReceivePipeline(object):
+    """
+    Converts received Speckle objects to Revit exactly once.
+
+    Everything runs inside one TransactionGroup that is assimilated at the end so it shows as a
+    single undo. Objects are committed in batches of batch_size, each object inside its own
+    SubTransaction so a failed conversion is rolled back without losing the rest of the batch.
+
+    Usage:
+        pipeline = ReceivePipeline(doc, converter, on_converted=tag_elements)
+        report = pipeline.run([(key, speckle_object), ...], to_delete=element_ids)
+    """
+    def __init__(self, rvt_document, converter, batch_size=100, on_converted=None):
+        self.rvt_document = rvt_document
+        self.converter = converter
+        self.batch_size = batch_size
+        self.on_converted = on_converted  # callable(key, speckle_object, List[DB.Element])
+
+    def run(self, keyed_objects, to_delete=None, name='Speckle Receive'):
+        report = ConversionReport()
+        transaction_group = DB.TransactionGroup(self.rvt_document, name)
+        transaction_group.Start()
+        try:
+            if to_delete:
+                self._delete(to_delete)
+            for batch_idx, batch in enumerate(chunks(keyed_objects, self.batch_size)):
+                self._convert_batch(batch, batch_idx, report)
+            start = time.time()
+            transaction_group.Assimilate()
+            report.transaction_seconds += time.time() - start
+        except Exception:
+            transaction_group.RollBack()
+            raise
+        finally:
+            transaction_group.Dispose()
+        return report
+
+    def _delete(self, element_ids):
+        eids = System.Collections.Generic.List[DB.ElementId](element_ids)
+        t = DB.Transaction(self.rvt_document, 'Delete changed DirectShapes')
+        t.Start()
+        try:
+            self.rvt_document.Delete(eids)
+            t.Commit()
+        except Exception:
+            t.RollBack()
+            raise
+        finally:
+            t.Dispose()
+
+    def _convert_batch(self, batch, batch_idx, report):
+        t = DB.Transaction(self.rvt_document, 'Create DirectShape batch {}'.format(batch_idx))
+        t.Start()
+        try:
+            for key, speckle_object in batch:
+                self._convert(key, speckle_object, report)
+            start = time.time()
+            t.Commit()
+            report.transaction_seconds += time.time() - start
+        except Exception:
+            t.RollBack()
+            raise
+        finally:
+            t.Dispose()
+
+    def _convert(self, key, speckle_object, report):
+        sub_transaction = DB.SubTransaction(self.rvt_document)
+        sub_transaction.Start()
+        start = time.time()
+        try:
+            result = self.converter.ConvertToNative(speckle_object)
+            elements = [self.rvt_document.GetElement(guid) for guid in result.CreatedIds]
+            if self.on_converted:
+                self.on_converted(key, speckle_object, elements)
+            sub_transaction.Commit()
+            report.add(key=key,
+                       speckle_type=speckle_object.speckle_type,
+                       seconds=time.time() - start,
+                       created=len(elements))
+        except Exception as ex:
+            sub_transaction.RollBack()
+            report.add(key=key,
+                       speckle_type=speckle_object.speckle_type,
+                       seconds=time.time() - start,
+                       error=str(ex))
+        finally:
+            sub_transaction.Dispose()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Structured reports of Speckle Compute runs. Pure python
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+class ConversionRecord(object):
+    def __init__(self, key=None, speckle_type=None, seconds=0.0, created=0, error=None):
+        self.key = key
+        self.speckle_type = speckle_type
+        self.seconds = seconds
+        self.created = created
+        self.error = error
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def to_dict(self):
+        return {'key': self.key,
+                'speckle_type': self.speckle_type,
+                'seconds': self.seconds,
+                'created': self.created,
+                'error': self.error}
+
+
+class ConversionReport(object):
+    """Per object conversion time and failures of a receive"""
+    def __init__(self):
+        self.records = []
+        self.transaction_seconds = 0.0  # Time spent committing transactions
+
+    def add(self, key=None, speckle_type=None, seconds=0.0, created=0, error=None):
+        record = ConversionRecord(key=key,
+                                  speckle_type=speckle_type,
+                                  seconds=seconds,
+                                  created=created,
+                                  error=error)
+        self.records.append(record)
+        return record
+
+    @property
+    def succeeded(self):
+        return [record for record in self.records if not record.failed]
+
+    @property
+    def failed(self):
+        return [record for record in self.records if record.failed]
+
+    @property
+    def total_seconds(self):
+        return sum([record.seconds for record in self.records])
+
+    def slowest(self, count=10):
+        return sorted(self.records, key=lambda r: r.seconds, reverse=True)[:count]
+
+    def to_dict(self):
+        return {'converted': len(self.succeeded),
+                'failed': len(self.failed),
+                'total_seconds': self.total_seconds,
+                'transaction_seconds': self.transaction_seconds,
+                'slowest': [record.to_dict() for record in self.slowest()],
+                'failures': [record.to_dict() for record in self.failed],
+                'records': [record.to_dict() for record in self.records]}
+
+    def __repr__(self):
+        return "ConversionReport converted:{} failed:{} in {:.2f} s".format(len(self.succeeded),
+                                                                           len(self.failed),
+                                                                           self.total_seconds)
+
+
+class RunReport(object):
+    """
+    Timing, object counts and bytes of every stage of a send or receive run
+
+    Stages with the same name accumulate, so a stage can be measured inside a loop.
+
+    Usage:
+        report = RunReport('send', stream_id=stream_id)
+        with report.stage('convert', count=1):
+            base = converter.ConvertToSpeckle(element)
+        report.dump(folder)
+    """
+    def __init__(self, name, **info):
+        self.name = name
+        self.info = info
+        self.started = time.time()
+        self.stages = []
+        self._stages_by_name = {}
+        self.sections = {}
+
+    def add_stage(self, name, seconds=0.0, count=0, nbytes=0):
+        stage = self._stages_by_name.get(name)
+        if not stage:
+            stage = {'name': name, 'seconds': 0.0, 'count': 0, 'bytes': 0}
+            self._stages_by_name[name] = stage
+            self.stages.append(stage)
+        stage['seconds'] += seconds
+        stage['count'] += count
+        stage['bytes'] += nbytes
+        return stage
+
+    @contextmanager
+    def stage(self, name, count=0, nbytes=0):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, seconds=time.time() - start, count=count, nbytes=nbytes)
+
+    def add_section(self, name, data):
+        """Extra structured data, ie: a ConversionReport.to_dict()"""
+        self.sections[name] = data
+
+    def get_stage(self, name):
+        return self._stages_by_name.get(name)
+
+    def to_dict(self):
+        return {'name': self.name,
+                'info': self.info,
+                'started': self.started,
+                'total_seconds': time.time() - self.started,
+                'stages': self.stages,
+                'sections': self.sections}
+
+    def dump(self, folder):
+        """Writes the report as {name}_{YYYYmmdd_HHMMSS}.json in folder and returns its path"""
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        filename = '{}_{}.json'.format(self.name, time.strftime('%Y%m%d_%H%M%S', time.localtime(self.started)))
+        filepath = os.path.join(folder, filename)
+        with open(filepath, 'w') as jsf:
+            json.dump(self.to_dict(), jsf, indent=2, sort_keys=True)
+        return filepath
+
+    def __repr__(self):
+        return "RunReport {}: ".format(self.name) + ", ".join(
+            ["{} {:.2f} s".format(stage['name'], stage['seconds']) for stage in self.stages])
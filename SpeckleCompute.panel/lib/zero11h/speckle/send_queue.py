@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Background send queue
+
+Conversion to Speckle Base must happen in Revit API context. Serialization, upload and commit
+creation do not touch the Revit API, so they run on a worker thread while the user keeps working.
+Progress and completion callbacks are marshalled back to the Revit API thread through an
+ExternalEvent.
+"""
+
+import threading
+import traceback
+
+try:
+    import Queue as queue  # IronPython 2.7
+except ImportError:
+    import queue
+
+from zero11h.revit_api.ui import ExternalEventDispatcher
+
+
+class SendJobStatus(object):
+    """SendJob status enum like object. Do not instantiate"""
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    COMMITTING = 'committing'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class SendJob(object):
+    """
+    A Base ready to be sent.
+
+    send: callable(base) -> object id. Serializes and uploads base
+    commit: callable(object_id) -> commit id
+    on_progress: callable(job) called every time the job changes status
+    on_done: callable(job) called when the job is done or failed
+
+    Callbacks run in Revit API context.
+    """
+    def __init__(self, base, send, commit, name=None, on_progress=None, on_done=None):
+        self.base = base
+        self.send = send
+        self.commit = commit
+        self.name = name
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.status = SendJobStatus.QUEUED
+        self.object_id = None
+        self.commit_id = None
+        self.error = None
+
+    def __repr__(self):
+        return "SendJob {} {}".format(self.name, self.status)
+
+
+class SendQueue(object):
+    """
+    Runs SendJobs one after the other on a worker thread.
+
+    Must be created in Revit API context (ie: from a pushbutton script) because of ExternalEvent.Create
+    """
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._dispatcher = ExternalEventDispatcher('SpeckleCompute Send Queue')
+        self._worker = threading.Thread(target=self._work, name='SpeckleComputeSendQueue')
+        self._worker.daemon = True
+        self._worker.start()
+
+    def submit(self, job):
+        self._jobs.put(job)
+        self._dispatcher.post(job.on_progress, job)
+        return job
+
+    @property
+    def pending(self):
+        return self._jobs.qsize()
+
+    def _set_status(self, job, status):
+        job.status = status
+        self._dispatcher.post(job.on_progress, job)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                self._set_status(job, SendJobStatus.SENDING)
+                job.object_id = job.send(job.base)
+                self._set_status(job, SendJobStatus.COMMITTING)
+                job.commit_id = job.commit(job.object_id)
+                job.status = SendJobStatus.DONE
+            except Exception as ex:
+                job.error = '{}\n{}'.format(ex, traceback.format_exc())
+                job.status = SendJobStatus.FAILED
+            finally:
+                job.base = None  # Release the Base as soon as it is uploaded
+                self._dispatcher.post(job.on_done, job)
+                self._jobs.task_done()
+
+
+_SEND_QUEUE = None
+
+
+def get_send_queue():
+    """Send queue shared by all sends of the session"""
+    global _SEND_QUEUE
+    if _SEND_QUEUE is None:
+        _SEND_QUEUE = SendQueue()
+    return _SEND_QUEUE
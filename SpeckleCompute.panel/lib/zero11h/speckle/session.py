@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Speckle session shared by the SpeckleCompute pushbuttons
+
+Loading the Speckle assemblies, the default kit, the Revit converter, the account and the client
+takes seconds. They are initialized once per Revit session (per document for the converter) and
+kept in the AppDomain data, so they survive pyRevit engine reloads between clicks.
+
+Usage:
+    from zero11h.speckle import session
+    from Speckle.Core import Api  # Speckle assemblies are referenced by session import
+
+    converter = session.get_converter(doc)
+    client = session.get_client()
+    print(session.startup_report())
+"""
+
+import os
+import time
+
+import clr
+import System
+
+APPDATA = os.getenv('APPDATA')
+
+SPECKLE_CORE_PATH = os.getenv('SPECKLE_COMPUTE_CORE_PATH',
+                              APPDATA + r'\Autodesk\Revit\Addins\2024\SpeckleRevit2\SpeckleCore2')
+SPECKLE_OBJECTS_PATH = os.getenv('SPECKLE_COMPUTE_OBJECTS_PATH',
+                                 APPDATA + r'\Speckle\Kits\Objects\Objects.Converter.Revit2024')
+
+# Server and local object cache can be overridden to run against a local stand-in Speckle server
+SERVER_URL = os.getenv('SPECKLE_COMPUTE_SERVER_URL', "http://139.59.153.219/")
+SERVER_TOKEN = os.getenv('SPECKLE_COMPUTE_TOKEN', "121657036ca1f96cc67872e539d66a545346f08065")
+CACHE_PATH = os.getenv('SPECKLE_COMPUTE_CACHE', os.path.join(APPDATA, 'SpeckleCompute'))
+
+_SESSION_KEY = 'zero11h.speckle.session'
+
+STARTUP_TIMES = []  # (step name, seconds, is cold)
+
+
+def _get_state():
+    """Session state dict stored in the AppDomain so every pyRevit engine shares it"""
+    state = System.AppDomain.CurrentDomain.GetData(_SESSION_KEY)
+    if state is None:
+        state = {}
+        System.AppDomain.CurrentDomain.SetData(_SESSION_KEY, state)
+    return state
+
+
+def _cached(key, factory):
+    state = _get_state()
+    start = time.time()
+    is_cold = key not in state
+    if is_cold:
+        state[key] = factory()
+    STARTUP_TIMES.append((key, time.time() - start, is_cold))
+    return state[key]
+
+
+def _load_assembly(assembly_path):
+    """Reference an assembly, reusing it if it is already loaded in Revit"""
+    start = time.time()
+    assembly_name = os.path.basename(assembly_path)
+    for assembly in System.AppDomain.CurrentDomain.GetAssemblies():
+        if assembly.GetName().Name == assembly_name:
+            clr.AddReference(assembly)
+            STARTUP_TIMES.append(('assembly {}'.format(assembly_name), time.time() - start, False))
+            return
+    clr.AddReferenceToFileAndPath(assembly_path)
+    STARTUP_TIMES.append(('assembly {}'.format(assembly_name), time.time() - start, True))
+
+
+_load_assembly(SPECKLE_CORE_PATH)
+_load_assembly(SPECKLE_OBJECTS_PATH)
+
+from Speckle.Core import Api, Credentials, Kits, Transports
+import Objects
+
+
+def _create_account():
+    server_info = Api.ServerInfo()
+    server_info.url = SERVER_URL
+    account = Credentials.Account()
+    account.token = SERVER_TOKEN
+    account.serverInfo = server_info
+    return account
+
+
+def get_account():
+    # return _cached('account', Credentials.AccountManager.GetDefaultAccount)
+    return _cached('account', _create_account)
+
+
+def get_client():
+    return _cached('client', lambda: Api.Client(get_account()))
+
+
+def get_kit():
+    return _cached('kit', Kits.KitManager.GetDefaultKit)
+
+
+def _document_key(rvt_document):
+    return '{}|{}'.format(rvt_document.Title, rvt_document.PathName)
+
+
+def get_converter(rvt_document):
+    """Revit converter of the document. Context document is set again on every call"""
+    converter = _cached('converter {}'.format(_document_key(rvt_document)),
+                        lambda: get_kit().LoadConverter(Objects.Converter.Revit.ConverterRevit.RevitAppName))
+    converter.SetContextDocument(rvt_document)
+    return converter
+
+
+def get_local_transport(stream_id):
+    """
+    Persistent SQLite object cache, one database per server and stream.
+    Operations.Receive checks it by object id before asking the server, so unchanged
+    commits and unchanged children are read from disk.
+    """
+    def create_local_transport():
+        if not os.path.exists(CACHE_PATH):
+            os.makedirs(CACHE_PATH)
+        server_key = SERVER_URL.split('://')[-1].strip('/').replace(':', '_').replace('/', '_')
+        return Transports.SQLiteTransport(CACHE_PATH, server_key, stream_id)
+
+    return _cached('local transport {}'.format(stream_id), create_local_transport)
+
+
+def get_server_transport(stream_id):
+    """
+    ServerTransport keeps per operation state (progress, cancellation, write queue),
+    so a new one is handed out per operation. The account it uses is cached.
+    """
+    return Transports.ServerTransport(get_account(), stream_id)
+
+
+def get_versions():
+    """Versions of the Speckle assemblies in use, to tell runs of different plugin versions apart"""
+    names = [os.path.basename(SPECKLE_CORE_PATH), os.path.basename(SPECKLE_OBJECTS_PATH)]
+    versions = {}
+    for assembly in System.AppDomain.CurrentDomain.GetAssemblies():
+        assembly_name = assembly.GetName()
+        if assembly_name.Name in names:
+            versions[assembly_name.Name] = str(assembly_name.Version)
+    return versions
+
+
+def startup_report():
+    """Time spent initializing Speckle since last report, split in cold and warm steps"""
+    cold = sum([seconds for _, seconds, is_cold in STARTUP_TIMES if is_cold])
+    warm = sum([seconds for _, seconds, is_cold in STARTUP_TIMES if not is_cold])
+    lines = ['Speckle startup: {:.2f} s cold, {:.2f} s warm'.format(cold, warm)]
+    for name, seconds, is_cold in STARTUP_TIMES:
+        lines.append('  {:<50} {:.3f} s {}'.format(name, seconds, 'cold' if is_cold else 'warm'))
+    del STARTUP_TIMES[:]
+    return '\n'.join(lines)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Speckle transports for measuring sends
+
+Usage:
+    counter = ByteCountingTransport()
+    transports = List[Transports.ITransport]()
+    transports.Add(session.get_server_transport(stream_id))
+    transports.Add(counter)
+    Api.Operations.Send(base, transports).Wait()
+    print(counter.SavedObjectCount, counter.saved_bytes)
+"""
+
+from System import TimeSpan
+from System.Collections.Generic import Dictionary
+from System.Threading import CancellationToken
+from System.Threading.Tasks import Task
+
+from zero11h.speckle import session  # References the Speckle assemblies
+from Speckle.Core import Transports
+
+
+class ByteCountingTransport(Transports.ITransport):
+    """
+    Write only transport that adds up the length of every serialized object Operations.Send hands
+    it, without keeping them, so the bytes of a send are measured at no memory cost.
+    Lengths are in characters of the serialized JSON, the uncompressed size of the upload.
+    """
+    def __init__(self, name='ByteCounter'):
+        self._name = name
+        self._context = Dictionary[str, object]()
+        self._cancellation_token = CancellationToken()  # CancellationToken.None
+        self._on_progress = None
+        self._on_error = None
+        self.saved_objects = 0
+        self.saved_bytes = 0
+
+    @property
+    def TransportName(self):
+        return self._name
+
+    @TransportName.setter
+    def TransportName(self, value):
+        self._name = value
+
+    @property
+    def TransportContext(self):
+        return self._context
+
+    @property
+    def Elapsed(self):
+        return TimeSpan.Zero
+
+    @property
+    def SavedObjectCount(self):
+        return self.saved_objects
+
+    @property
+    def CancellationToken(self):
+        return self._cancellation_token
+
+    @CancellationToken.setter
+    def CancellationToken(self, value):
+        self._cancellation_token = value
+
+    @property
+    def OnProgressAction(self):
+        return self._on_progress
+
+    @OnProgressAction.setter
+    def OnProgressAction(self, value):
+        self._on_progress = value
+
+    @property
+    def OnErrorAction(self):
+        return self._on_error
+
+    @OnErrorAction.setter
+    def OnErrorAction(self, value):
+        self._on_error = value
+
+    def BeginWrite(self):
+        pass
+
+    def EndWrite(self):
+        pass
+
+    def SaveObject(self, object_id, serialized_or_source):
+        """SaveObject(id, serializedObject) and SaveObject(id, sourceTransport)"""
+        if isinstance(serialized_or_source, str):
+            serialized = serialized_or_source
+        else:
+            serialized = serialized_or_source.GetObject(object_id) or ''
+        self.saved_objects += 1
+        self.saved_bytes += len(serialized)
+
+    def WriteComplete(self):
+        return Task.CompletedTask
+
+    def GetObject(self, object_id):
+        return None  # Nothing is kept
+
+    def CopyObjectAndChildren(self, object_id, target_transport, on_total_children_count_known=None):
+        raise NotImplementedError('ByteCountingTransport is write only')
+
+    def HasObjects(self, object_ids):
+        return Task.FromResult(Dictionary[str, bool]())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Branch watch mode. Pure python
+
+Polls the head of a Speckle branch and calls back only when the referenced object changes.
+While nothing changes the polling interval backs off up to max_interval.
+"""
+
+import threading
+import traceback
+
+
+class BranchWatcher(object):
+    """
+    get_head: callable() -> referenced object id of the branch head. Runs on the watcher thread
+    on_change: callable(object_id) called when the head changes. Runs on the watcher thread, so
+               anything touching the Revit API has to be marshalled (ie: ExternalEventDispatcher)
+
+    Usage:
+        watcher = BranchWatcher(get_head, on_change, last_head=current_object_id)
+        watcher.start()
+        ...
+        watcher.stop()
+    """
+    def __init__(self, get_head, on_change,
+                 min_interval=5.0,
+                 max_interval=300.0,
+                 backoff=2.0,
+                 last_head=None):
+        self.get_head = get_head
+        self.on_change = on_change
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.last_head = last_head
+        self.interval = min_interval
+        self.hits = 0  # polls where the head had changed
+        self.misses = 0  # polls where the head was the same
+        self.errors = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """
+        Returns:
+            bool: True if the head changed and on_change was called
+        """
+        try:
+            head = self.get_head()
+        except Exception:
+            self.errors += 1
+            self._back_off()
+            print('BranchWatcher ERROR polling branch head:\n{}'.format(traceback.format_exc()))
+            return False
+        if head and head != self.last_head:
+            self.hits += 1
+            self.last_head = head
+            self.interval = self.min_interval
+            self.on_change(head)
+            return True
+        self.misses += 1
+        self._back_off()
+        return False
+
+    def _back_off(self):
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.poll()
+            self._stop_event.wait(self.interval)
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='SpeckleComputeBranchWatcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def hit_ratio(self):
+        polls = self.hits + self.misses
+        if not polls:
+            return 0.0
+        return float(self.hits) / polls
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_ratio': self.hit_ratio,
+                'interval': self.interval,
+                'last_head': self.last_head}
+
+    def __repr__(self):
+        return "BranchWatcher hits:{} misses:{} errors:{} next poll in {} s".format(self.hits,
+                                                                                  self.misses,
+                                                                                  self.errors,
+                                                                                  self.interval)
+
+
+_WATCHERS = {}  # (stream_id, branch_name): BranchWatcher
+
+
+def get_watcher(stream_id, branch_name):
+    return _WATCHERS.get((stream_id, branch_name))
+
+
+def set_watcher(stream_id, branch_name, watcher):
+    _WATCHERS[(stream_id, branch_name)] = watcher
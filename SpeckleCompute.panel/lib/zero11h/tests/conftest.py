@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# RT caches default to the temp folder, where the plugin keeps its real ones. Loaded by pytest
+# before any test module imports rt, and read by the caches on every use
+os.environ['SPECKLE_COMPUTE_RT_CACHE'] = tempfile.mkdtemp(prefix='rt_tests_')
@@ -0,0 +1,199 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.abspath('..'))
+
+import unittest
+from unittest import TestCase
+
+from rt.parallel import SingleFlight, map_bounded
+from rt.rate_limiter import RateLimiter, parse_retry_after
+from rt.rt_cache import (LRUCache, PersistentEntityCache, get_record_index, load_json_file, merge_records,
+                         replace_file)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestLRUCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'size': 2})
+
+
+class TestPersistentEntityCache(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def test_survives_reload_with_numeric_keys(self):
+        cache = PersistentEntityCache('material', folder=self.folder)
+        cache[101] = {'id': 101}
+        cache.save()
+        reloaded = PersistentEntityCache('material', folder=self.folder)
+        self.assertTrue(101 in reloaded)
+        self.assertEqual(reloaded[101], {'id': 101})
+
+    def test_default_folder_follows_the_cache_folder_setting(self):
+        cache = PersistentEntityCache('material')
+        folder = os.environ.get('SPECKLE_COMPUTE_RT_CACHE')
+        try:
+            os.environ['SPECKLE_COMPUTE_RT_CACHE'] = self.folder
+            self.assertEqual(os.path.dirname(cache.cache_filepath), self.folder)
+        finally:
+            if folder is None:
+                os.environ.pop('SPECKLE_COMPUTE_RT_CACHE')
+            else:
+                os.environ['SPECKLE_COMPUTE_RT_CACHE'] = folder
+
+    def test_expired_records_are_missing(self):
+        cache = PersistentEntityCache('material', ttl=0, folder=self.folder)
+        cache['a'] = {}
+        self.assertFalse('a' in cache)
+        self.assertEqual(cache.get('a', 'default'), 'default')
+
+    def test_merge_changes_revalidates_every_record(self):
+        cache = PersistentEntityCache('component-type_tree', ttl=10, folder=self.folder)
+        cache['a'] = {'code': 'a'}
+        cache['b'] = {'code': 'b'}
+        for entry in cache.entries.values():
+            entry['timestamp'] -= 60
+        self.assertFalse('a' in cache)
+        replaced = cache.merge_changes([{'code': 'a', 'changed': True}, {'code': 'new'}])
+        self.assertEqual(replaced, 1)
+        self.assertEqual(cache['a'], {'code': 'a', 'changed': True})
+        self.assertTrue('b' in cache)
+        self.assertFalse('new' in cache)
+
+    def test_merge_changes_drops_records_fetched_before_max_age(self):
+        cache = PersistentEntityCache('material', ttl=10, folder=self.folder)
+        cache['a'] = {'code': 'a'}
+        cache['b'] = {'code': 'b'}
+        for entry in cache.entries.values():
+            entry['fetched'] -= 120
+        cache.merge_changes([{'code': 'a', 'changed': True}], max_age=60)
+        self.assertEqual(cache['a'], {'code': 'a', 'changed': True})
+        self.assertFalse('b' in cache)
+        self.assertEqual(list(cache.entries.keys()), ['a'])
+
+
+class TestJsonFiles(TestCase):
+    def test_parsed_once_per_modification(self):
+        filepath = os.path.join(tempfile.mkdtemp(), 'data.json')
+        with open(filepath, 'w') as jsf:
+            jsf.write('[{"code": "a"}]')
+        self.assertTrue(load_json_file(filepath) is load_json_file(filepath))
+
+    def test_replace_file_over_existing_file(self):
+        folder = tempfile.mkdtemp()
+        filepath = os.path.join(folder, 'data.json')
+        for content in ('[1]', '[2]'):
+            with open(filepath + '.tmp', 'w') as jsf:
+                jsf.write(content)
+            replace_file(filepath + '.tmp', filepath)
+        self.assertEqual(load_json_file(filepath), [2])
+        self.assertEqual(os.listdir(folder), ['data.json'])
+
+
+class TestRecordIndex(TestCase):
+    def test_select_keeps_list_order(self):
+        records = [{'code': 'a'}, {'code': 'b'}, {'code': 'a', 'copy': True}, {'code': 3}]
+        index = get_record_index(records)
+        self.assertEqual(index.select(['3', 'a']), [records[0], records[2], records[3]])
+        self.assertTrue(get_record_index(records) is index)
+        self.assertEqual(index.select('b'), [records[1]])
+        self.assertEqual(index.select(3), [records[3]])
+
+    def test_merge_records(self):
+        records = [{'code': 'a'}, {'code': 'b'}]
+        merged = merge_records(records, [{'code': 'b', 'changed': True}, {'code': 'c'}])
+        self.assertEqual(merged, [{'code': 'a'}, {'code': 'b', 'changed': True}, {'code': 'c'}])
+        self.assertEqual(records, [{'code': 'a'}, {'code': 'b'}])
+
+
+class TestRateLimiter(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(rate=2.0, burst=2, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_spaced(self):
+        self.assertEqual(self.limiter.acquire(), 0.0)
+        self.assertEqual(self.limiter.acquire(), 0.0)
+        self.assertAlmostEqual(self.limiter.acquire(), 0.5)
+
+    def test_throttle_halves_rate_and_waits_retry_after(self):
+        self.limiter.throttle(retry_after=3.0)
+        self.assertEqual(self.limiter.rate, 1.0)
+        self.assertAlmostEqual(self.limiter.acquire(), 3.0)
+        self.limiter.success()
+        self.assertAlmostEqual(self.limiter.rate, 1.1)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('2'), 2.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), None)
+        self.assertEqual(parse_retry_after(None), None)
+
+
+class TestMapBounded(TestCase):
+    def test_keeps_order_and_runs_in_parallel(self):
+        def slow_double(value):
+            time.sleep(0.05 * (4 - value))
+            return value * 2
+        start = time.time()
+        self.assertEqual(map_bounded(slow_double, range(4), max_workers=4), [0, 2, 4, 6])
+        self.assertTrue(time.time() - start < 0.3)
+
+    def test_raises_first_error(self):
+        with self.assertRaises(ZeroDivisionError):
+            map_bounded(lambda value: 1 / value, [1, 0, 2], max_workers=2)
+
+
+class TestSingleFlight(TestCase):
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        calls = []
+        results = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return ['data']
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('url', fetch)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while flight.shared < 2:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted([shared for _, shared in results]), [False, True, True])
+        self.assertTrue(results[0][0] is results[1][0])
+        self.assertEqual(len(flight), 0)
+
+    def test_finished_calls_are_not_remembered(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do('url', lambda: 1), (1, False))
+        self.assertEqual(flight.do('url', lambda: 2), (2, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
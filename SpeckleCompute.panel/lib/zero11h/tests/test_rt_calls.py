@@ -1,19 +1,386 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.abspath('..'))
+
 import unittest
 from unittest import TestCase
 
-from rt.rt_entities import ComponentType, ExecutionUnitType, LayerGroupType, LayerType, LayerMaterial
-from rt.rt_handler_py3 import api011h_request, Api011hRequestHandler, API_KEY, API_TOKEN
+try:
+    from StringIO import StringIO  # Python 2
+except ImportError:
+    from io import StringIO
+
+from rt import rt_handler
+from rt.rt_entities import TemplateType
+from rt.rt_handler import api011h_request, Api011hRequestHandler
+from rt.rate_limiter import RateLimiter
+from rt.metrics import RTMetrics
+from rt.mock_server import MockRTServer
+from rt.snapshot import (RTSnapshot, SnapshotRequestHandler, load_snapshot, component_type_entity,
+                         MATERIAL_ENTITY, TEMPLATE_ENTITY)
+from rt.transport import ThrottledError, UrllibTransport
+
+MATERIAL_IDS = [101, 102, 103, 104]
+UPDATED = '2999-01-01T00:00:00Z'  # updated_at of records changed after any sync
+
+
+def component_type_data(code, material_ids):
+    layer_types = [{'layer_type': {'id': material_id * 10, 'material_id': material_id}}
+                   for material_id in material_ids]
+    return {'code': code,
+            'name': 'Component {}'.format(code),
+            'associated_execution_unit_types': [
+                {'execution_unit_type': {'code': 'EU-{}'.format(code),
+                                         'associated_layer_group_types': [
+                                             {'layer_group_type': {'associated_layer_types': layer_types}}]}}]}
+
+
+def make_snapshot():
+    snapshot = RTSnapshot()
+    codes = ['CT-{:02d}'.format(index) for index in range(12)]
+    for model_type in ('tree', 'full'):
+        snapshot.add_records(component_type_entity(model_type),
+                             [component_type_data(code, MATERIAL_IDS[:2]) for code in codes])
+    snapshot.add_records(MATERIAL_ENTITY,
+                         [{'id': material_id, 'name': 'Material {}'.format(material_id)}
+                          for material_id in MATERIAL_IDS],
+                         key_field='id')
+    for code in codes:
+        snapshot.add(TEMPLATE_ENTITY, 'EU-{}'.format(code), {'code': code, 'process_types': []})
+    snapshot.add_records(rt_handler.TEMPLATE_TYPE_ENTITY,
+                         [{'code': code, 'eu_type': 'EU-{}'.format(code), 'process_types': []}
+                          for code in codes])
+    snapshot.add_records('segment/segment', [{'code': 'S{}'.format(index)} for index in range(50)])
+    snapshot.add_records('segment/partial-segment', [{'code': 'PS1'}])
+    snapshot.add_records('segment/view-template', [{'code': 'VT1'}])
+    return snapshot
+
+
+def make_request(server, **kwargs):
+    kwargs.setdefault('reset_cache', True)
+    handler = Api011hRequestHandler(api_key='test',
+                                    api_token='test',
+                                    rate_limiter=RateLimiter(rate=1000, burst=1000),
+                                    transport=UrllibTransport(),
+                                    **kwargs)
+    handler.url = server.url
+    return api011h_request(handler=handler)
+
+
+def clear_caches():
+    for cache in (rt_handler.COMPONENT_DATA__TREE, rt_handler.COMPONENT_DATA__FULL,
+                  rt_handler.MATERIAL_DATA, rt_handler.TEMPLATES_ACCESSED, rt_handler.TEMPLATE_REGISTRY,
+                  rt_handler.SYNC_STATE, rt_handler.FULL_SYNC_STATE):
+        cache.clear()
+
+
+class TestRTCalls(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.server = MockRTServer(make_snapshot()).start()
+        self.request = make_request(self.server)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_component_types_are_requested_in_bulk(self):
+        ids = ['CT-03', 'CT-01', 'CT-99']
+        data = self.request.get_component_types(ids=ids)
+        self.assertEqual([item['code'] for item in data], ['CT-03', 'CT-01'])
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_cached_component_types_are_not_requested_again(self):
+        self.request.get_component_types(ids=['CT-01'])
+        self.request.get_component_types(ids=['CT-01'])
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_long_id_lists_are_chunked(self):
+        self.request.handler.max_url_length = len(self.server.url) + 80
+        data = self.request.get_component_types(ids=['CT-{:02d}'.format(index) for index in range(12)])
+        self.assertEqual(len(data), 12)
+        self.assertTrue(self.server.request_count > 1)
+
+    def test_materials_by_id(self):
+        data = self.request.get_materials(ids=[103, 101, 103])
+        self.assertEqual([item['id'] for item in data], [103, 101, 103])
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_templates_are_loaded_once_in_bulk(self):
+        template = self.request.get_template_from_execution_unit_id(eu_type_id='EU-CT-05')
+        self.assertEqual(template['code'], 'CT-05')
+        template = self.request.get_template_from_execution_unit_id(eu_type_id='EU-CT-07')
+        self.assertEqual(template['code'], 'CT-07')
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_unknown_templates_are_requested_by_execution_unit_type(self):
+        self.server.snapshot.entities.pop(rt_handler.TEMPLATE_TYPE_ENTITY)
+        template = self.request.get_template_from_execution_unit_id(eu_type_id='EU-CT-05')
+        self.assertEqual(template['code'], 'CT-05')
+        self.assertTrue(self.server.requests[-1].endswith('?eu_type=EU-CT-05'))
+
+    def test_templates_without_eu_type_warn_and_are_requested_by_execution_unit_type(self):
+        for template_data in self.server.snapshot.records(rt_handler.TEMPLATE_TYPE_ENTITY):
+            template_data.pop('eu_type')
+        stdout = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            template = self.request.get_template_from_execution_unit_id(eu_type_id='EU-CT-05')
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(template['code'], 'CT-05')
+        self.assertEqual(len(rt_handler.TEMPLATE_REGISTRY), 0)
+        self.assertTrue('WARNING' in output.getvalue())
+
+    def test_segments_in_list_order(self):
+        data = self.request.get_segments(ids=['S7', 'S2'])
+        self.assertEqual([item['code'] for item in data], ['S2', 'S7'])
+
+    def test_segments_by_single_id(self):
+        self.assertEqual(self.request.get_segments(ids='S1'), [{'code': 'S1'}])
+
+    def test_retries_throttled_requests(self):
+        self.server.throttle = 2
+        data = self.request.get_materials(ids=[101])
+        self.assertEqual(len(data), 1)
+        self.assertEqual(self.request.handler.rate_limiter.throttled, 2)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.throttle = rt_handler.MAX_RETRIES + 1
+        with self.assertRaises(ThrottledError):
+            self.request.get_materials(ids=[101])
+
+
+class TestStaleWhileRevalidate(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.server = MockRTServer(make_snapshot()).start()
+        self.request = make_request(self.server, reset_cache=False)
+        self.cache = rt_handler.TempCacheData(entity='segment/segment')
+        self.cache.set_cached_data([{'code': 'OLD'}])
+
+    def tearDown(self):
+        self.server.stop()
+
+    def age_cache(self, seconds):
+        mtime = time.time() - seconds
+        os.utime(self.cache.cache_filepath, (mtime, mtime))
+
+    def test_fresh_cache_is_not_requested(self):
+        self.assertEqual(self.request.get_segments(), [{'code': 'OLD'}])
+        self.assertEqual(self.server.request_count, 0)
+
+    def test_stale_cache_is_served_and_refreshed_in_background(self):
+        self.age_cache(rt_handler.TEMP_CACHE_TTL + 60)
+        self.assertEqual(self.request.get_segments(), [{'code': 'OLD'}])
+        rt_handler.wait_for_revalidations()
+        self.assertEqual(len(self.request.get_segments()), 50)
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_missing_cache_file_is_not_an_error(self):
+        os.remove(self.cache.cache_filepath)
+        self.assertEqual(self.cache.get_age(), None)
+        self.assertEqual(self.cache.get_cached_data(), None)
+        self.assertEqual(self.cache.get_last_data(), None)
+
+    def test_too_stale_cache_is_refetched(self):
+        self.age_cache(rt_handler.TEMP_CACHE_TTL + rt_handler.MAX_STALENESS + 60)
+        self.assertEqual(len(self.request.get_segments()), 50)
+
+
+class TestDeltaSync(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.snapshot = make_snapshot()
+        self.server = MockRTServer(self.snapshot).start()
+        self.request = make_request(self.server, reset_cache=False)
+        cache_filepath = rt_handler.TempCacheData(entity='segment/segment').cache_filepath
+        if os.path.exists(cache_filepath):
+            os.remove(cache_filepath)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_entity_list_merges_changed_records(self):
+        self.assertEqual(len(self.request.get_segments()), 50)
+        self.snapshot.add_records('segment/segment', [{'code': 'S1', 'name': 'changed', 'updated_at': UPDATED},
+                                                      {'code': 'S99', 'updated_at': UPDATED}])
+        cache_filepath = rt_handler.TempCacheData(entity='segment/segment').cache_filepath
+        mtime = time.time() - rt_handler.TEMP_CACHE_TTL - rt_handler.MAX_STALENESS - 60
+        os.utime(cache_filepath, (mtime, mtime))
+
+        data = self.request.get_segments()
+        self.assertEqual(len(data), 51)
+        self.assertEqual(data[1]['name'], 'changed')
+        self.assertEqual(self.server.request_count, 2)
+        self.assertTrue('updated_at=gt:' in self.server.requests[-1])
+
+    def test_empty_delta_keeps_entity_list(self):
+        self.assertEqual(len(self.request.get_segments()), 50)
+        self.assertEqual(self.request.handler.sync_entity_list('segment/segment'), 0)
+        data = self.request.get_segments()
+        self.assertEqual(len(data), 50)
+        self.assertEqual(data[-1], {'code': 'S49'})
+
+    def test_entity_list_is_refetched_after_max_delta_age(self):
+        self.request.get_segments()
+        self.snapshot.entities['segment/segment']['records'].pop()  # Deleted in RT
+        for entry in rt_handler.FULL_SYNC_STATE.entries.values():
+            entry['timestamp'] -= rt_handler.MAX_DELTA_AGE + 60
+        self.assertEqual(self.request.handler.sync_entity_list('segment/segment'), None)
+        cache_filepath = rt_handler.TempCacheData(entity='segment/segment').cache_filepath
+        mtime = time.time() - rt_handler.TEMP_CACHE_TTL - rt_handler.MAX_STALENESS - 60
+        os.utime(cache_filepath, (mtime, mtime))
+
+        self.assertEqual(len(self.request.get_segments()), 49)
+        self.assertFalse('updated_at=gt:' in self.server.requests[-1])
+
+    def test_sync_revalidates_expired_component_types(self):
+        self.request.get_component_types(ids=['CT-01', 'CT-02'])
+        changed_record = component_type_data('CT-01', [])
+        changed_record.update({'name': 'changed', 'updated_at': UPDATED})
+        self.snapshot.add_records(component_type_entity('tree'), [changed_record])
+        for entry in rt_handler.COMPONENT_DATA__TREE.entries.values():
+            entry['timestamp'] -= rt_handler.COMPONENT_DATA__TREE.ttl + 60
+
+        changed = self.request.sync()
+        self.assertEqual(changed['component/component-type?model_type=tree'], 1)
+        data = self.request.get_component_types(ids=['CT-01', 'CT-02'])
+        self.assertEqual([item['name'] for item in data], ['changed', 'Component CT-02'])
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_delta_merged_records_have_the_fetched_shape(self):
+        answer = self.server.answer
+
+        def summarized_lists(path):
+            # Like RT, list endpoints with a verbosity and the material list answer other shapes
+            status, data = answer(path)
+            if 'verbosity=' in path or path.split('?')[0].endswith(MATERIAL_ENTITY):
+                data = {'data': [{'code': record.get('code'), 'id': record.get('id'),
+                                  'updated_at': record.get('updated_at')} for record in data['data']],
+                        'error': None}
+            return status, data
+
+        self.server.answer = summarized_lists
+        self.request.get_component_types(ids=['CT-01'])
+        self.request.get_materials(ids=[101])
+        changed_component_type = component_type_data('CT-01', [])
+        changed_component_type.update({'name': 'changed', 'updated_at': UPDATED})
+        self.snapshot.add_records(component_type_entity('tree'), [changed_component_type])
+        changed_material = {'id': 101, 'name': 'changed', 'updated_at': UPDATED}
+        self.snapshot.add_records(MATERIAL_ENTITY, [changed_material], key_field='id')
+
+        changed = self.request.sync()
+        self.assertEqual(changed['component/component-type?model_type=tree'], 1)
+        self.assertEqual(changed['segment/material'], 1)
+        merged = (self.request.get_component_types(ids=['CT-01'])[0], self.request.get_materials(ids=[101])[0])
+        clear_caches()
+        fetched = (self.request.get_component_types(ids=['CT-01'])[0], self.request.get_materials(ids=[101])[0])
+        self.assertEqual(merged, fetched)
+        self.assertEqual(merged, (changed_component_type, changed_material))
+
+
+class TestRTMetrics(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.server = MockRTServer(make_snapshot()).start()
+        self.metrics = RTMetrics()
+        self.request = make_request(self.server, metrics=self.metrics)
+        self.request.metrics = self.metrics
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_requests_and_cache_hits_by_endpoint(self):
+        self.request.get_component_types(ids=['CT-01', 'CT-02'])
+        self.request.get_component_types(ids=['CT-01'])
+        self.server.throttle = 1
+        self.request.get_materials(ids=[101])
+        components = self.metrics.get('component/component-type')
+        self.assertEqual((components.requests, components.hits, components.misses), (1, 1, 2))
+        self.assertTrue(components.bytes > 0)
+        materials = self.metrics.get('segment/material')
+        self.assertEqual((materials.requests, materials.throttled), (2, 1))
+        self.assertEqual(self.metrics.calls['get_component_types']['count'], 2)
+
+    def test_dump(self):
+        self.request.get_segments(ids=['S1'])
+        filepath = self.metrics.dump(tempfile.mkdtemp())
+        with open(filepath) as jsf:
+            data = json.load(jsf)
+        self.assertEqual(data['endpoints']['segment/segment']['requests'], 1)
+        self.assertEqual(sum(data['endpoints']['segment/segment']['latency_histogram'].values()), 1)
+
+
+class TestTemplateType(TestCase):
+    def test_process_types_by_id(self):
+        template = TemplateType({'code': 'T1',
+                                 'process_types': [{'operation_number': 10, 'process_type': {'code': 'P1'}},
+                                                   {'operation_number': 20, 'process_type': {'code': 'P2'}}]})
+        self.assertEqual(template.get_process_type('P2').operation_number, 20)
+        self.assertTrue(template.get_process_type('P2') is template.get_process_type('P2'))
+        self.assertEqual(template.get_process_type('P3'), None)
+
+
+class TestConcurrentRTCalls(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.server = MockRTServer(make_snapshot(), latency=0.1).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_materials_are_fetched_concurrently(self):
+        request = make_request(self.server, max_workers=4)
+        start = time.time()
+        data = request.get_materials(ids=MATERIAL_IDS)
+        elapsed = time.time() - start
+        self.assertEqual([item['id'] for item in data], MATERIAL_IDS)
+        self.assertTrue(elapsed < 0.3, 'Took {:.2f} s'.format(elapsed))
+
+    def test_identical_requests_in_flight_are_coalesced(self):
+        request = make_request(self.server, metrics=RTMetrics())
+        url = request.handler.url + 'segment/segment?verbosity=recursive&code=S1'
+        same_url = request.handler.url + 'segment/segment?code=S1&verbosity=recursive'
+        results = []
+        threads = [threading.Thread(target=lambda req_url=req_url: results.append(request.handler.get_request(req_url)))
+                   for req_url in (url, same_url, url)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(results, [[{'code': 'S1'}]] * 3)
+        self.assertEqual(request.handler.metrics.get('segment/segment').coalesced, 2)
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.server = MockRTServer(make_snapshot()).start()
+        self.request = make_request(self.server)
+        self.filepath = os.path.join(tempfile.mkdtemp(), 'rt_snapshot.json.gz')
+
+    def tearDown(self):
+        self.server.stop()
 
-req = api011h_request(handler=Api011hRequestHandler(api_key=API_KEY, api_token=API_TOKEN, cached=False))
-ctypes = req.get_component_types()
-c_ids_in_RT = [ct.get('code') for ct in ctypes]
+    def test_export_and_serve_offline(self):
+        from rt.snapshot import export_snapshot
+        export_snapshot(self.filepath, ['CT-01', 'CT-02'], request=self.request, info={'site': 'test'})
+        snapshot = load_snapshot(self.filepath)
+        self.assertEqual(snapshot.info['site'], 'test')
+        self.assertEqual(len(snapshot.records(MATERIAL_ENTITY)), 2)
 
-# WONT WORK because it imports rt module that has .NET stuff on it
+        offline = api011h_request(handler=SnapshotRequestHandler(snapshot))
+        self.assertEqual([item['code'] for item in offline.get_component_types(ids=['CT-02'], model_type='full')],
+                         ['CT-02'])
+        self.assertEqual(offline.get_template_from_execution_unit_id(eu_type_id='EU-CT-01')['code'], 'CT-01')
+        self.assertEqual(len(offline.get_segments()), 50)
+        self.assertEqual(offline.get_segments(ids='S1'), [{'code': 'S1'}])
 
-# class TestRTData(TestCase):
-#     def test_component_data(self):
-#         for cid in c_ids_in_RT:
-#             c_data = req.get_component_types(ids=cid)[0]
-#             component = ComponentType(c_data)
-#             self.assertTrue(isinstance(component, ComponentType))
 
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+
+import unittest
+from unittest import TestCase
+
+from speckle.diff import diff_received_objects, key_received_objects
+
+
+class TestReceiveDiff(TestCase):
+    def test_first_receive_converts_everything(self):
+        diff = diff_received_objects({'a': '1', 'b': '2'}, {})
+        self.assertEqual(diff.to_convert, ['a', 'b'])
+        self.assertEqual(diff.to_delete, [])
+
+    def test_only_changed_objects_are_converted(self):
+        diff = diff_received_objects({'a': '1', 'b': '3', 'c': '4'},
+                                     {'a': '1', 'b': '2', 'd': '5'})
+        self.assertEqual(diff.new, ['c'])
+        self.assertEqual(diff.changed, ['b'])
+        self.assertEqual(diff.unchanged, ['a'])
+        self.assertEqual(diff.removed, ['d'])
+        self.assertEqual(diff.to_convert, ['c', 'b'])
+        self.assertEqual(diff.to_delete, ['b', 'd'])
+
+
+class FakeSpeckleObject(object):
+    def __init__(self, speckle_id, application_id=None):
+        self.id = speckle_id
+        self.applicationId = application_id
+
+
+class TestKeyReceivedObjects(TestCase):
+    def test_objects_sharing_an_application_id_are_all_kept(self):
+        objects = [FakeSpeckleObject('1', 'wall'), FakeSpeckleObject('2', 'slab'),
+                   FakeSpeckleObject('3', 'wall'), FakeSpeckleObject('4')]
+        keyed = key_received_objects(objects)
+        self.assertEqual(sorted(keyed.keys()), ['4', 'slab', 'wall#0', 'wall#1'])
+        self.assertEqual(keyed['wall#1'].id, '3')
+        diff = diff_received_objects(dict((key, item.id) for key, item in keyed.items()), {})
+        self.assertEqual(len(diff.to_convert), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
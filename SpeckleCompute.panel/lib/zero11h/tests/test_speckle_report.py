@@ -0,0 +1,57 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import TestCase
+
+from speckle.report import ConversionReport, RunReport
+
+
+class TestConversionReport(TestCase):
+    def test_failures_and_slowest(self):
+        report = ConversionReport()
+        report.add(key='a', speckle_type='Objects.Other.DirectShape', seconds=0.5, created=1)
+        report.add(key='b', speckle_type='Objects.Other.DirectShape', seconds=2.0, error='Bad geometry')
+        report.add(key='c', speckle_type='Objects.Other.DirectShape', seconds=1.0, created=2)
+        self.assertEqual([r.key for r in report.failed], ['b'])
+        self.assertEqual([r.key for r in report.slowest(2)], ['b', 'c'])
+        self.assertEqual(report.total_seconds, 3.5)
+        self.assertEqual(report.to_dict()['converted'], 2)
+
+
+class TestRunReport(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_stages_accumulate(self):
+        report = RunReport('send')
+        with report.stage('convert', count=1):
+            pass
+        with report.stage('convert', count=1):
+            pass
+        report.add_stage('upload', seconds=1.5, count=10, nbytes=2048)
+        self.assertEqual([stage['name'] for stage in report.stages], ['convert', 'upload'])
+        self.assertEqual(report.get_stage('convert')['count'], 2)
+        self.assertEqual(report.get_stage('upload')['bytes'], 2048)
+
+    def test_dump_is_machine_readable(self):
+        report = RunReport('receive', stream_id='319b7f5b40')
+        report.add_stage('receive', seconds=0.25, count=1)
+        report.add_section('diff', {'new': 3})
+        with open(report.dump(self.folder)) as jsf:
+            data = json.load(jsf)
+        self.assertEqual(data['name'], 'receive')
+        self.assertEqual(data['info']['stream_id'], '319b7f5b40')
+        self.assertEqual(data['stages'][0]['seconds'], 0.25)
+        self.assertEqual(data['sections']['diff']['new'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
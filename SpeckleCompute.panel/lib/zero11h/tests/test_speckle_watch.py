@@ -0,0 +1,49 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+
+import unittest
+from unittest import TestCase
+
+from speckle.watch import BranchWatcher
+
+
+class TestBranchWatcher(TestCase):
+    def setUp(self):
+        self.heads = ['a', 'a', 'a', 'b']
+        self.changes = []
+        self.watcher = BranchWatcher(lambda: self.heads.pop(0),
+                                     self.changes.append,
+                                     min_interval=1.0,
+                                     max_interval=3.0,
+                                     backoff=2.0,
+                                     last_head='a')
+
+    def test_backs_off_while_head_does_not_change(self):
+        self.assertFalse(self.watcher.poll())
+        self.assertEqual(self.watcher.interval, 2.0)
+        self.assertFalse(self.watcher.poll())
+        self.assertFalse(self.watcher.poll())
+        self.assertEqual(self.watcher.interval, 3.0)
+        self.assertEqual(self.watcher.misses, 3)
+        self.assertEqual(self.changes, [])
+
+    def test_calls_back_and_resets_interval_on_change(self):
+        for _ in range(4):
+            self.watcher.poll()
+        self.assertEqual(self.changes, ['b'])
+        self.assertEqual(self.watcher.hits, 1)
+        self.assertEqual(self.watcher.interval, 1.0)
+        self.assertEqual(self.watcher.hit_ratio, 0.25)
+
+    def test_errors_back_off(self):
+        def failing_head():
+            raise IOError('server down')
+        watcher = BranchWatcher(failing_head, self.changes.append, min_interval=1.0, backoff=2.0)
+        self.assertFalse(watcher.poll())
+        self.assertEqual(watcher.errors, 1)
+        self.assertEqual(watcher.interval, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()